@@ -0,0 +1,188 @@
+# Created on Oct 19 2026
+# License is MIT, see COPYING.txt for more details.
+# @author: Theodore John McCormack
+
+"""
+Picks the escape time depth, the worker count and the tile size for
+image_fractal renders instead of fixed values.
+"""
+
+import json
+import multiprocessing
+import os
+import platform
+import time
+import numpy as np
+from image_fractal import generate_row, shaded_row
+
+PROBE_SIZE = (96, 96)
+PROBE_DEPTHS = [2**k for k in range(6, 15)]
+# Fraction of the probe pixels allowed to still be escaping past the depth
+PROBE_TOLERANCE = 5e-3
+# The probe sees less detail than the full render, so it gets some headroom
+DEPTH_MARGIN = 1.5
+
+CACHE_PATH = os.path.expanduser("~/.cache/ziafract/autotune.json")
+# Row functions of image_fractal by kernel name: the counts render runs the
+# pure Python generate_row, the shadings and checkpoints shaded_row.
+KERNELS = {"rows": generate_row, "fields": shaded_row}
+# generate_row is much slower per pixel, so it gets narrower rows
+CALIBRATE_SIZES = {"rows": (64, 256), "fields": (256, 256)}
+CALIBRATE_DEPTH = 128
+CALIBRATE_TILE_ROWS = [4, 16, 64]
+# Memory a worker needs besides its tile, in bytes
+WORKER_OVERHEAD = 64 * 2**20
+
+
+def log(*args):
+    print("Autotune:", *args)
+
+
+def probeCounts(model, c, size, depth, zoom, center):
+    """
+    Escape counts of the whole probe at once, on the pixel grid of
+    generate_row. Only the orbits still inside are iterated, so the deep
+    probe costs about its interior pixels times depth.
+    """
+    width, height = size
+    side = max(width, height)
+    sidem1 = side - 1
+    cols = (2 * (np.arange(width) + (side - width) / 2) / sidem1 - 1) / zoom + center[0]
+    rows = (
+        2 * (height - np.arange(height) + (side - height) / 2) / sidem1 - 1
+    ) / zoom + center[1]
+    pixel = (cols[None, :] + 1j * rows[:, None]).ravel()
+    z, add = (pixel, np.full(len(pixel), c)) if model == "julia" else (0 * pixel, pixel)
+    counts = np.full(len(pixel), depth)
+    active = np.arange(len(pixel))
+    for n in range(depth):
+        escaped = z.real**2 + z.imag**2 >= 4
+        counts[active[escaped]] = n
+        active, z, add = active[~escaped], z[~escaped], add[~escaped]
+        if not len(active):
+            break
+        z = z**2 + add
+    return counts
+
+
+def probeDepth(model, c, zoom, center, size=PROBE_SIZE, tolerance=PROBE_TOLERANCE):
+    """
+    Iteration depth for a view from a low resolution probe. The probe is
+    rendered once at the largest depth, and since counts at a smaller depth
+    d are just min(count, d), the pixels that would saturate at d but
+    escape later are counted for every candidate at no extra cost. The
+    smallest candidate where that fraction is under tolerance, with
+    DEPTH_MARGIN headroom, is returned.
+    """
+    start = time.time()
+    cap = PROBE_DEPTHS[-1]
+    counts = probeCounts(model, c, size, cap, zoom, center)
+    escaped = np.sort(counts[counts < cap])
+    depth = cap
+    for candidate in PROBE_DEPTHS:
+        late = len(escaped) - np.searchsorted(escaped, candidate)
+        if late / len(counts) < tolerance:
+            depth = candidate
+            break
+    inside = 1 - len(escaped) / len(counts)
+    depth = int(min(depth * DEPTH_MARGIN, cap))
+    log(
+        "depth %d from a %dx%d probe at zoom %g (%.1f%% inside, %.1f s)"
+        % (depth, size[0], size[1], zoom, 100 * inside, time.time() - start)
+    )
+    return depth
+
+
+def machineKey():
+    return "%s-%s-%d" % (
+        platform.node(),
+        platform.machine(),
+        multiprocessing.cpu_count(),
+    )
+
+
+def availableWorkers(width, tile_rows):
+    """Workers the machine can take right now, by idle CPUs and free memory."""
+    cpus = (
+        len(os.sched_getaffinity(0))
+        if hasattr(os, "sched_getaffinity")
+        else multiprocessing.cpu_count()
+    )
+    idle = max(1, int(round(cpus - os.getloadavg()[0])))
+    workers = idle
+    try:
+        with open("/proc/meminfo") as f:
+            meminfo = dict(line.split(":", 1) for line in f)
+        free = int(meminfo["MemAvailable"].split()[0]) * 1024
+        # A tile of rows of every field generate_row_fields keeps around
+        per_worker = WORKER_OVERHEAD + 10 * 8 * width * tile_rows
+        workers = min(workers, max(1, free // per_worker))
+    except (OSError, KeyError):
+        pass
+    return workers, cpus
+
+
+def _calibrationRun(kernel, workers, tile_rows):
+    size = CALIBRATE_SIZES[kernel]
+    view = ("julia", -0.75472 - 0.06592j, size, CALIBRATE_DEPTH, 0.6, (0, 0))
+    shading = ("smooth",) if kernel == "fields" else ()
+    args = [view + shading + (row,) for row in range(size[1])]
+    start = time.time()
+    with multiprocessing.Pool(workers) as pool:
+        pool.starmap(KERNELS[kernel], args, chunksize=tile_rows)
+    return size[0] * size[1] / (time.time() - start)
+
+
+def calibrate(kernel="fields", cache=CACHE_PATH, refresh=False):
+    """
+    Best worker count and tile rows of this machine for the row function
+    kernel of KERNELS, from a short benchmark over worker counts up to the
+    CPU count and CALIBRATE_TILE_ROWS, cached in cache under the machine
+    key and kernel so it only runs once per machine.
+    """
+    key = "%s:%s" % (machineKey(), kernel)
+    results = dict()
+    if os.path.exists(cache):
+        with open(cache) as f:
+            results = json.load(f)
+    if key in results and not refresh:
+        return results[key]
+
+    cpus = multiprocessing.cpu_count()
+    counts = sorted(
+        set([2**k for k in range(cpus.bit_length()) if 2**k <= cpus] + [cpus])
+    )
+    timings = list()
+    for workers in counts:
+        for tile_rows in CALIBRATE_TILE_ROWS:
+            rate = _calibrationRun(kernel, workers, tile_rows)
+            timings.append(
+                {"workers": workers, "tile_rows": tile_rows, "pixels_per_second": rate}
+            )
+            log(
+                "calibrating %d workers, %d rows per tile: %.0f pixels/s"
+                % (workers, tile_rows, rate)
+            )
+    best = max(timings, key=lambda t: t["pixels_per_second"])
+    results[key] = dict(best, measured=time.time(), timings=timings)
+    os.makedirs(os.path.dirname(cache), exist_ok=True)
+    with open(cache, "w") as f:
+        json.dump(results, f, indent=1)
+    log("calibration of %s saved to %s" % (key, cache))
+    return results[key]
+
+
+def tuneWorkers(size, kernel="fields", cache=CACHE_PATH):
+    """
+    Worker count and tile rows for a render of size with the row function
+    kernel on this machine now.
+    """
+    best = calibrate(kernel, cache)
+    tile_rows = best["tile_rows"]
+    available, cpus = availableWorkers(size[0], tile_rows)
+    workers = max(1, min(best["workers"], available))
+    log(
+        "%d workers (calibrated %d, %d available of %d CPUs), %d rows per tile"
+        % (workers, best["workers"], available, cpus, tile_rows)
+    )
+    return workers, tile_rows
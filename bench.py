@@ -0,0 +1,398 @@
+#!/usr/bin/env python
+# Created on Oct 19 2026
+# License is MIT, see COPYING.txt for more details.
+# @author: Theodore John McCormack
+
+"""
+Benchmarks for the Zia scenes
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import numpy as np
+from mesh import getCubeArray, getCubeArrays, getCubeColors, indexedCubes
+from scene import ZiaScene
+from zia import Zia
+
+# The per-point concatenation is quadratic, past this it takes minutes.
+MAX_LOOP_MESH = 5000
+
+
+def timed(func, *args, repeat=3):
+    """Best wall time of repeat calls to func(*args) and its last result."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def loopMesh(centers, size):
+    """How Zia3D used to build its mesh, one concatenate per cube."""
+    arr = np.array([])
+    for xpt, ypt, zpt in centers:
+        if arr.size:
+            arr = np.concatenate((arr, getCubeArray(xpt, ypt, zpt, size)))
+        else:
+            arr = getCubeArray(xpt, ypt, zpt, size)
+    return arr, np.abs(arr.copy())
+
+
+def vectorMesh(centers, size):
+    arr = getCubeArrays(centers, size)
+    return arr, getCubeColors(arr)
+
+
+def bench_mesh(args):
+    print(f"{'cubes':>10} {'loop s':>10} {'vector s':>10} {'MB':>10} {'Mcubes/s':>10}")
+    rng = np.random.default_rng(0)
+    for n in args.sizes:
+        centers = rng.uniform(-3.0, 3.0, size=(n, 3))
+        loop = "-"
+        if n <= MAX_LOOP_MESH:
+            seconds, (ref, refcol) = timed(loopMesh, centers, 0.05, repeat=1)
+            loop = f"{seconds:10.4f}"
+        seconds, (arr, col) = timed(vectorMesh, centers, 0.05)
+        if n <= MAX_LOOP_MESH:
+            assert np.allclose(arr, ref, atol=1e-5) and np.allclose(
+                col, refcol, atol=1e-5
+            )
+        mb = (arr.nbytes + col.nbytes) / 2.0**20
+        print(
+            f"{n:>10} {loop:>10} {seconds:10.4f} {mb:10.1f} {n / seconds / 1e6:10.2f}"
+        )
+
+
+def bench_indexed(args):
+    print(
+        f"{'cubes':>10} {'tris':>10} {'tris idx':>10} {'MB':>8} {'MB idx':>8} {'verts idx':>10} {'s':>8}"
+    )
+    for n in args.sizes:
+        # Zia3D's flat Zia, whose cubes overlap along the rays
+        xpts, ypts = Zia(1, 2, 1, npts=n).genZia()
+        centers = np.column_stack((xpts, ypts, np.zeros_like(xpts)))
+        seconds, (vertices, colors, indices, stats) = timed(
+            indexedCubes, centers, args.size, repeat=1
+        )
+        print(
+            f"{stats['cubes']:>10} {stats['triangles before']:>10} "
+            f"{stats['triangles after']:>10} {stats['bytes before'] / 2.0**20:8.2f} "
+            f"{stats['bytes after'] / 2.0**20:8.2f} {stats['vertices after']:>10} "
+            f"{seconds:8.3f}"
+        )
+
+
+def bench_scene(args):
+    scene = ZiaScene.hierarchy(levels=args.levels)
+    # Fly from far away straight into the deepest, last instance, closing
+    # the distance geometrically so every level gets its close up.
+    target = scene.centers[-1]
+    start = np.array([0.0, 0.0, 12.0])
+    print(
+        f"{len(scene)} instances, {len(scene.bvh)} BVH nodes, {scene.triangles} triangles per mesh"
+    )
+    print(
+        f"{'frame':>6} {'dist':>8} {'visible':>8} {'full':>6} {'coarse':>7} "
+        f"{'points':>7} {'tris':>10} {'tris all':>10} {'ms':>7}"
+    )
+    total, seconds = 0, 0.0
+    for i in range(args.frames):
+        frac = (1.0 - 1e-3 ** (i / (args.frames - 1))) / (1.0 - 1e-3)
+        eye = start + frac * (target - start) * 0.999
+        modelview = np.eye(4)
+        modelview[:3, 3] = -eye
+        t, (_, stats) = timed(scene.select, modelview, 4.0 / 3.0, args.height, repeat=1)
+        total += stats["triangles"]
+        seconds += t
+        if i % max(args.frames // 10, 1) == 0 or i == args.frames - 1:
+            print(
+                f"{i:>6} {np.linalg.norm(target - eye):8.4f} {stats['visible']:>8} "
+                f"{stats['full']:>6} {stats['coarse']:>7} {stats['points']:>7} "
+                f"{stats['triangles']:>10} {stats['triangles all']:>10} {t * 1000:7.2f}"
+            )
+    print(
+        f"{total / args.frames:.0f} triangles per frame submitted of "
+        f"{stats['triangles all']}, {seconds / args.frames * 1000:.2f} ms culling per frame"
+    )
+
+
+def rss():
+    """Resident set size of this process in bytes, from /proc."""
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def memFract(args):
+    from ziafract import fract
+
+    xpts, ypts = Zia(1.0, 2.0, 1, rayN=args.fract_rays, sunN=4).genZia()
+    return lambda: fract(xpts, ypts, args.fract_scale, budget=None)
+
+
+def memZia3D(args):
+    from zia3d import Zia3D
+
+    return lambda: Zia3D("Zia3D", 640, 480, npts=args.zia3d_points)
+
+
+def memPlaceImages(args):
+    import matplotlib.pyplot as plt
+    from image_fractal import DEFAULT_SMALL_IMG, DEFAULT_LARGE_IMG
+    from image_fractal import generate_row_fields, place_images
+
+    size = (args.image_size, args.image_size)
+    img = np.array(
+        [
+            generate_row_fields(
+                "julia", -0.75472 - 0.06592j, size, 100, 0.6, (0, 0), row
+            )[0]
+            for row in range(size[1])
+        ],
+        dtype=np.float64,
+    )
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    small = os.path.join(here, DEFAULT_SMALL_IMG)
+    large = os.path.join(here, DEFAULT_LARGE_IMG)
+
+    def run():
+        out = place_images(img, size, small, large, output=None)
+        plt.close("all")
+        return out
+
+    return run
+
+
+# Rises of the traced memory at least this big are counted as allocations,
+# smaller ones are interpreter noise.
+MEM_BIG_BLOCK = 1 << 16
+
+MEM_STAGES = {"fract": memFract, "zia3d": memZia3D, "place_images": memPlaceImages}
+
+
+class AllocationCounter(object):
+    """
+    Profile hook following the traced memory across every Python and C
+    call and return of a stage. Each rise of at least MEM_BIG_BLOCK bytes
+    between two events counts as one allocation and adds to the bytes
+    allocated, so arrays that are freed again before the stage ends, which
+    neither the peak nor a final snapshot show, are still counted.
+    """
+
+    def __init__(self, threshold=MEM_BIG_BLOCK):
+        self.threshold = threshold
+        self.count = 0
+        self.allocated = 0
+        self.last = 0
+
+    def __call__(self, frame, event, arg):
+        current = tracemalloc.get_traced_memory()[0]
+        if current - self.last >= self.threshold:
+            self.count += 1
+            self.allocated += current - self.last
+        self.last = current
+
+    def __enter__(self):
+        self.last = tracemalloc.get_traced_memory()[0]
+        sys.setprofile(self)
+        return self
+
+    def __exit__(self, *exc):
+        sys.setprofile(None)
+        self(None, "return", None)
+
+
+def memStage(name, args):
+    """
+    Runs one stage in this (fresh worker) process and measures it: the
+    traced Python and NumPy peak, the big allocations made (see
+    AllocationCounter) and their bytes, the blocks and bytes still held
+    while its result is alive (from tracemalloc snapshots before and after)
+    and the peak resident set size sampled from /proc every millisecond.
+    The seconds include the profile hook.
+    """
+    import matplotlib
+
+    matplotlib.use("Agg")
+    run = MEM_STAGES[name](args)
+    base = rss()
+    peak = [base]
+    stop = threading.Event()
+
+    def sample():
+        while not stop.wait(0.001):
+            peak[0] = max(peak[0], rss())
+
+    sampler = threading.Thread(target=sample)
+    sampler.start()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    start = time.perf_counter()
+    with AllocationCounter() as counter:
+        result = run()
+    seconds = time.perf_counter() - start
+    current, traced = tracemalloc.get_traced_memory()
+    held = tracemalloc.take_snapshot().compare_to(before, "filename")
+    tracemalloc.stop()
+    stop.set()
+    sampler.join()
+    del result
+    return {
+        "peak traced": traced,
+        "peak rss": max(peak[0], rss()) - base,
+        "allocations": counter.count,
+        "allocated": counter.allocated,
+        "held blocks": sum(max(stat.count_diff, 0) for stat in held),
+        "held": sum(max(stat.size_diff, 0) for stat in held),
+        "seconds": seconds,
+    }
+
+
+# Metrics checked against the baseline, with the growth each may show on an
+# unchanged tree on top of the relative tolerance. RSS moves by pages and
+# allocator arenas, so small stages would fail on noise alone.
+MEM_METRICS = {
+    "peak traced": 2**16,
+    "peak rss": 4 * 2**20,
+    "allocations": 1,
+    "allocated": 2**16,
+    "held": 2**16,
+}
+MEM_BASELINE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "membaseline.json"
+)
+
+
+def memOver(stats, baseline, tolerance):
+    """Metrics of stats that grew past tolerance and their slack over baseline."""
+    return [
+        metric
+        for metric, slack in MEM_METRICS.items()
+        if stats[metric] > baseline[metric] + max(tolerance * baseline[metric], slack)
+    ]
+
+
+def bench_memory(args):
+    sizes = {
+        "fract": f"rays={args.fract_rays},scale={args.fract_scale}",
+        "zia3d": f"npts={args.zia3d_points}",
+        "place_images": f"size={args.image_size}",
+    }
+    baseline = dict()
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results, failed = dict(), list()
+    print(
+        f"{'stage':>14} {'traced MB':>10} {'rss MB':>10} {'allocs':>8} "
+        f"{'alloc MB':>10} {'held MB':>8} {'s':>7}  baseline"
+    )
+    for name in args.stages:
+        # Every stage gets its own process, so their peaks do not mix
+        with multiprocessing.Pool(1) as pool:
+            stats = pool.apply(memStage, (name, args))
+        key = f"{name}:{sizes[name]}"
+        results[key] = stats
+        note = "-"
+        if key in baseline and not args.save:
+            over = memOver(stats, baseline[key], args.tolerance)
+            note = "over in " + ", ".join(over) if over else "ok"
+            failed += [f"{key} {metric}" for metric in over]
+        print(
+            f"{name:>14} {stats['peak traced'] / 2.0**20:10.1f} "
+            f"{stats['peak rss'] / 2.0**20:10.1f} {stats['allocations']:>8} "
+            f"{stats['allocated'] / 2.0**20:10.1f} {stats['held'] / 2.0**20:8.1f} "
+            f"{stats['seconds']:7.2f}  {note}"
+        )
+
+    if args.save:
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=1, sort_keys=True)
+        print(f"Saved baseline to {args.baseline}")
+    elif failed:
+        print(
+            f"Memory regressions over {args.tolerance:.0%} and the slack: "
+            + "; ".join(failed)
+        )
+        sys.exit(1)
+
+
+def cli_parse_args(args=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    mesh = commands.add_parser("mesh", help="Zia3D cube mesh construction")
+    mesh.add_argument(
+        "--sizes",
+        nargs="+",
+        type=int,
+        default=[1000, 2000, 10000, 100000, 1000000],
+        help="Numbers of cubes to build",
+    )
+    mesh.set_defaults(func=bench_mesh)
+
+    indexed = commands.add_parser(
+        "indexed", help="Indexed Zia3D mesh with hidden faces removed"
+    )
+    indexed.add_argument(
+        "--sizes",
+        nargs="+",
+        type=int,
+        default=[2000, 20000, 200000],
+        help="Numbers of Zia points",
+    )
+    indexed.add_argument("--size", default=0.05, type=float, help="Cube half side")
+    indexed.set_defaults(func=bench_indexed)
+
+    scene = commands.add_parser("scene", help="Culled, level of detail Zia hierarchy")
+    scene.add_argument("--levels", default=2, type=int, help="Hierarchy levels")
+    scene.add_argument(
+        "--frames", default=200, type=int, help="Frames of the fly through"
+    )
+    scene.add_argument(
+        "--height", default=480, type=int, help="Screen height in pixels"
+    )
+    scene.set_defaults(func=bench_scene)
+
+    memory = commands.add_parser(
+        "memory", help="Peak memory of the big allocations, checked against a baseline"
+    )
+    memory.add_argument(
+        "--stages", nargs="+", choices=list(MEM_STAGES), default=list(MEM_STAGES)
+    )
+    memory.add_argument(
+        "--fract-rays", default=2, type=int, help="Points per ray of the fract Zia"
+    )
+    memory.add_argument("--fract-scale", default=0.05, type=float, help="fract scale")
+    memory.add_argument("--zia3d-points", default=2000, type=int, help="Zia3D points")
+    memory.add_argument("--image-size", default=512, type=int, help="place_images side")
+    memory.add_argument("--baseline", default=MEM_BASELINE, help="Baseline JSON file")
+    memory.add_argument(
+        "--save", action="store_true", help="Store the results as baseline"
+    )
+    memory.add_argument(
+        "--tolerance",
+        default=0.1,
+        type=float,
+        help="Allowed relative growth over the baseline, at least "
+        "the absolute slack of MEM_METRICS",
+    )
+    memory.set_defaults(func=bench_memory)
+
+    return parser.parse_args(args)
+
+
+if __name__ == "__main__":
+    args = cli_parse_args()
+    args.func(args)
@@ -0,0 +1,79 @@
+# Created on Oct 19 2026
+# License is MIT, see COPYING.txt for more details.
+# @author: Theodore John McCormack
+
+import numpy as np
+
+
+def toneLog(counts):
+    """Maps hit counts to [0, 1] with log(1 + count)."""
+    peak = counts.max()
+    if not peak:
+        return np.zeros(counts.shape)
+    return np.log1p(counts) / np.log1p(peak)
+
+
+def toneGamma(counts, gamma=0.5):
+    """Maps hit counts to [0, 1] with (count / max)^gamma."""
+    peak = counts.max()
+    if not peak:
+        return np.zeros(counts.shape)
+    return np.power(counts / float(peak), gamma)
+
+
+TONES = {"log": toneLog, "gamma": toneGamma}
+
+
+class DensityRaster(object):
+    """
+    Bins point clouds into a width x height histogram over
+    view = (xmin, xmax, ymin, ymax). Points can be added in any number of
+    chunks, so the full point set never has to be in memory at once, and
+    row 0 of the image is the top (ymax) of the view like imshow expects.
+    """
+
+    def __init__(self, width, height, view):
+        self.width = int(width)
+        self.height = int(height)
+        self.view = tuple(float(v) for v in view)
+        self.counts = np.zeros((self.height, self.width), dtype=np.int64)
+        self.npts = 0
+
+    def clear(self, view=None):
+        if view is not None:
+            self.view = tuple(float(v) for v in view)
+        self.counts[:] = 0
+        self.npts = 0
+
+    def add(self, xpts, ypts):
+        xmin, xmax, ymin, ymax = self.view
+        col = (np.asarray(xpts) - xmin) * (self.width / (xmax - xmin))
+        row = (ymax - np.asarray(ypts)) * (self.height / (ymax - ymin))
+        inside = (col >= 0) & (col < self.width) & (row >= 0) & (row < self.height)
+        flat = row[inside].astype(np.intp) * self.width + col[inside].astype(np.intp)
+        if len(flat) < self.counts.size:
+            # A histogram of the whole raster would cost more than the points
+            np.add.at(self.counts.reshape(-1), flat, 1)
+        else:
+            self.counts += np.bincount(flat, minlength=self.counts.size).reshape(
+                self.counts.shape
+            )
+        self.npts += len(flat)
+        return self
+
+    def addChunks(self, chunks):
+        """Accumulates an iterable of (xpts, ypts) chunks, e.g. fractView."""
+        for xpts, ypts in chunks:
+            self.add(xpts, ypts)
+        return self
+
+    def image(self, tone="log", **kwargs):
+        """Tone mapped float image in [0, 1] of the accumulated counts."""
+        return TONES[tone](self.counts, **kwargs)
+
+    def rgb(self, color=(0, 0, 0), background=(1, 1, 1), tone="log", **kwargs):
+        """uint8 (height, width, 3) image blending color over background."""
+        alpha = self.image(tone, **kwargs)[..., None]
+        color, background = np.asarray(color), np.asarray(background)
+        out = background + alpha * (color - background)
+        return (255 * out + 0.5).astype(np.uint8)
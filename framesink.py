@@ -0,0 +1,203 @@
+# Created on Oct 19 2026
+# License is MIT, see COPYING.txt for more details.
+# @author: Theodore John McCormack
+
+import io
+import os
+import shutil
+import struct
+import subprocess
+import numpy as np
+from PIL import Image
+
+
+class FFmpegWriter(object):
+    """Pipes raw RGB frames into ffmpeg, which encodes them as it goes."""
+
+    def __init__(self, output, width, height, fps=30):
+        self.output = output
+        self.proc = subprocess.Popen(
+            [
+                "ffmpeg",
+                "-y",
+                "-loglevel",
+                "error",
+                "-f",
+                "rawvideo",
+                "-pix_fmt",
+                "rgb24",
+                "-s",
+                f"{width}x{height}",
+                "-r",
+                str(fps),
+                "-i",
+                "-",
+                "-vf",
+                "pad=ceil(iw/2)*2:ceil(ih/2)*2",
+                "-pix_fmt",
+                "yuv420p",
+                output,
+            ],
+            stdin=subprocess.PIPE,
+        )
+
+    def write(self, frame):
+        self.proc.stdin.write(memoryview(frame))
+
+    def close(self):
+        self.proc.stdin.close()
+        if self.proc.wait():
+            raise RuntimeError(f"ffmpeg failed writing {self.output}")
+
+
+class GifWriter(object):
+    """
+    Animated GIF written one frame at a time. Every frame is quantized to
+    its own 256 color palette and LZW encoded by Pillow as a single image
+    GIF, whose image block is then appended to the file with the palette as
+    local color table, so no frames are kept around.
+    """
+
+    def __init__(self, output, width, height, fps=30, loop=0):
+        self.output = output
+        self.delay = int(round(100.0 / fps))  # in 1/100 s
+        self.file = open(output, "wb")
+        # Header and logical screen descriptor without a global color table.
+        self.file.write(b"GIF89a" + struct.pack("<HHBBB", width, height, 0, 0, 0))
+        # NETSCAPE2.0 application extension with the loop count.
+        self.file.write(
+            b"\x21\xff\x0bNETSCAPE2.0\x03\x01" + struct.pack("<H", loop) + b"\x00"
+        )
+        self.buf = io.BytesIO()
+
+    @staticmethod
+    def _skipSubBlocks(data, pos):
+        while data[pos]:
+            pos += data[pos] + 1
+        return pos + 1
+
+    @classmethod
+    def _imageBlock(cls, data):
+        """
+        Image descriptor, local color table and LZW data of the first image
+        of a GIF. A global color table is moved into the local one, and a
+        local table already there is kept.
+        """
+        flags = data[10]
+        pos = 13
+        table = b""
+        if flags & 0x80:
+            size = 3 << ((flags & 0x07) + 1)
+            table = bytes(data[pos : pos + size])
+            pos += size
+        while data[pos] == 0x21:
+            pos = cls._skipSubBlocks(data, pos + 2)
+        if data[pos] != 0x2C:
+            raise ValueError("No image block in GIF frame")
+
+        descriptor = bytearray(data[pos : pos + 10])
+        pos += 10
+        if descriptor[9] & 0x80:
+            size = 3 << ((descriptor[9] & 0x07) + 1)
+            table = bytes(data[pos : pos + size])
+            pos += size
+        elif table:
+            descriptor[9] |= 0x80 | (flags & 0x07)
+        # LZW minimum code size, then the data sub-blocks.
+        end = cls._skipSubBlocks(data, pos + 1)
+        return bytes(descriptor) + table + bytes(data[pos:end])
+
+    def write(self, frame):
+        image = Image.frombuffer("RGB", frame.shape[1::-1], frame, "raw", "RGB", 0, 1)
+        self.buf.seek(0)
+        self.buf.truncate()
+        image.quantize(256).save(self.buf, "GIF")
+        data = self.buf.getbuffer()
+        block = self._imageBlock(data)
+        del data
+
+        # Graphic control extension with the frame delay.
+        self.file.write(struct.pack("<BBBBHBB", 0x21, 0xF9, 4, 0, self.delay, 0, 0))
+        self.file.write(block)
+
+    def close(self):
+        self.file.write(b"\x3b")
+        self.file.close()
+
+
+class FrameDirWriter(object):
+    """Dumps every frame as a numbered PNG file into a directory."""
+
+    def __init__(self, output, width, height, fps=30):
+        self.output = output
+        self.frame = 0
+        os.makedirs(output, exist_ok=True)
+
+    def write(self, frame):
+        image = Image.frombuffer("RGB", frame.shape[1::-1], frame, "raw", "RGB", 0, 1)
+        image.save(os.path.join(self.output, "frame_%05d.png" % self.frame))
+        self.frame += 1
+
+    def close(self):
+        pass
+
+
+class FrameSink(object):
+    """
+    Fans every RGB frame out to all writers at once, so a renderer produces
+    each frame a single time however many outputs there are. Renderers can
+    fill the reusable buffer() in place to keep memory flat over long
+    animations.
+    """
+
+    def __init__(self, writers, width, height):
+        self.writers = writers
+        self.width = width
+        self.height = height
+        self.frames = 0
+        self._buffer = np.empty((height, width, 3), dtype=np.uint8)
+
+    def buffer(self):
+        return self._buffer
+
+    def write(self, frame=None):
+        frame = self._buffer if frame is None else np.ascontiguousarray(frame, np.uint8)
+        if frame.shape != self._buffer.shape:
+            raise ValueError(f"Frame shape {frame.shape} is not {self._buffer.shape}")
+        for writer in self.writers:
+            writer.write(frame)
+        self.frames += 1
+
+    def close(self):
+        for writer in self.writers:
+            writer.close()
+        if self.writers:
+            print(
+                f"Wrote {self.frames} frames to "
+                + ", ".join(w.output for w in self.writers)
+            )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def openSink(outputs, width, height, fps=30):
+    """
+    FrameSink for the outputs: paths ending in a slash are directories of
+    PNG frames, .gif files are written in process, anything else through
+    ffmpeg when it is installed and skipped otherwise.
+    """
+    writers = list()
+    for output in outputs:
+        if output.endswith(("/", os.sep)):
+            writers.append(FrameDirWriter(output, width, height, fps))
+        elif output.lower().endswith(".gif"):
+            writers.append(GifWriter(output, width, height, fps))
+        elif shutil.which("ffmpeg"):
+            writers.append(FFmpegWriter(output, width, height, fps))
+        else:
+            print(f"ffmpeg not found, skipping {output}")
+    return FrameSink(writers, width, height)
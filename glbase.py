@@ -1,123 +1,30 @@
+import os
+from glplatform import BACKEND
+
+# Offscreen runs render this many frames into these comma separated outputs.
+FRAMES = int(os.environ.get("GLBASE_FRAMES", "300"))
+OUTPUTS = [o for o in os.environ.get("GLBASE_OUTPUTS", "").split(",") if o]
+# Frame times are written here (.json or .csv) when the scene stops.
+TRACE = os.environ.get("GLBASE_TRACE")
+# gluPerspective field of view (degrees) and clip planes, scene culls with these.
+FOVY = 45.0
+NEAR = 0.1
+FAR = 100.0
+
 from OpenGL.GL import *
 from OpenGL.GLUT import *
 from OpenGL.GLU import *
+from OpenGL.GL import shaders
+import contextlib
+import csv
+import ctypes
+import json
 import numpy as np
+import random
 import time
 import sys
-
-
-# This cube was taken from
-# http://www.opengl-tutorial.org/beginners-tutorials/tutorial-4-a-colored-cube/
-CUBE = [
-    -1.0,
-    -1.0,
-    -1.0,  # triangle 1 : begin
-    -1.0,
-    -1.0,
-    1.0,
-    -1.0,
-    1.0,
-    1.0,  # triangle 1 : end
-    1.0,
-    1.0,
-    -1.0,  # triangle 2 : begin
-    -1.0,
-    -1.0,
-    -1.0,
-    -1.0,
-    1.0,
-    -1.0,  # triangle 2 : end
-    1.0,
-    -1.0,
-    1.0,
-    -1.0,
-    -1.0,
-    -1.0,
-    1.0,
-    -1.0,
-    -1.0,
-    1.0,
-    1.0,
-    -1.0,
-    1.0,
-    -1.0,
-    -1.0,
-    -1.0,
-    -1.0,
-    -1.0,
-    -1.0,
-    -1.0,
-    -1.0,
-    -1.0,
-    1.0,
-    1.0,
-    -1.0,
-    1.0,
-    -1.0,
-    1.0,
-    -1.0,
-    1.0,
-    -1.0,
-    -1.0,
-    1.0,
-    -1.0,
-    -1.0,
-    -1.0,
-    -1.0,
-    1.0,
-    1.0,
-    -1.0,
-    -1.0,
-    1.0,
-    1.0,
-    -1.0,
-    1.0,
-    1.0,
-    1.0,
-    1.0,
-    1.0,
-    -1.0,
-    -1.0,
-    1.0,
-    1.0,
-    -1.0,
-    1.0,
-    -1.0,
-    -1.0,
-    1.0,
-    1.0,
-    1.0,
-    1.0,
-    -1.0,
-    1.0,
-    1.0,
-    1.0,
-    1.0,
-    1.0,
-    1.0,
-    -1.0,
-    -1.0,
-    1.0,
-    -1.0,
-    1.0,
-    1.0,
-    1.0,
-    -1.0,
-    1.0,
-    -1.0,
-    -1.0,
-    1.0,
-    1.0,
-    1.0,
-    1.0,
-    1.0,
-    -1.0,
-    1.0,
-    1.0,
-    1.0,
-    -1.0,
-    1.0,
-]
+from framesink import openSink
+from mesh import CUBE, getCubeArray, getCubeArrays, getCubeColors
 
 
 def drawCube(xpt, ypt, zpt, size):
@@ -182,15 +89,159 @@ def drawCube(xpt, ypt, zpt, size):
     glPopMatrix()
 
 
-def getCubeArray(xpt, ypt, zpt, size):
-    # scale by size
-    arr = size * np.array(list(CUBE))
-    # translate by coordinate
-    for i in range(0, len(CUBE), 3):
-        arr[0 + i] += xpt
-        arr[1 + i] += ypt
-        arr[2 + i] += zpt
-    return np.array(arr)
+def createBuffer(data, target=GL_ARRAY_BUFFER, usage=GL_STATIC_DRAW):
+    # Upload data once into a buffer object that lives on the graphics card
+    data = np.ascontiguousarray(data)
+    buf = glGenBuffers(1)
+    glBindBuffer(target, buf)
+    glBufferData(target, data.nbytes, data, usage)
+    glBindBuffer(target, 0)
+    return buf
+
+
+def compileProgram(vertexSrc, fragmentSrc):
+    return shaders.compileProgram(
+        shaders.compileShader(vertexSrc, GL_VERTEX_SHADER),
+        shaders.compileShader(fragmentSrc, GL_FRAGMENT_SHADER),
+    )
+
+
+def hasInstancing():
+    # Needs a current context, core since OpenGL 3.3 (or ARB_instanced_arrays)
+    return bool(glDrawArraysInstanced) and bool(glVertexAttribDivisor)
+
+
+def drawArrayBuffer(vertexBuf, count, colorBuf=None, mode=GL_TRIANGLES):
+    # Same as glVertexPointer/glColorPointer on NumPy arrays, but the arrays
+    # already sit in buffer objects so nothing is sent per frame
+    glEnableClientState(GL_VERTEX_ARRAY)
+    glBindBuffer(GL_ARRAY_BUFFER, vertexBuf)
+    glVertexPointer(3, GL_FLOAT, 0, None)
+    if colorBuf is not None:
+        glEnableClientState(GL_COLOR_ARRAY)
+        glBindBuffer(GL_ARRAY_BUFFER, colorBuf)
+        glColorPointer(3, GL_FLOAT, 0, None)
+    glDrawArrays(mode, 0, count)
+    glBindBuffer(GL_ARRAY_BUFFER, 0)
+    glDisableClientState(GL_VERTEX_ARRAY)
+    if colorBuf is not None:
+        glDisableClientState(GL_COLOR_ARRAY)
+
+
+def drawElementBuffer(vertexBuf, indexBuf, count, colorBuf=None, mode=GL_TRIANGLES):
+    # Indexed version of drawArrayBuffer, count uint32 indices from indexBuf
+    glEnableClientState(GL_VERTEX_ARRAY)
+    glBindBuffer(GL_ARRAY_BUFFER, vertexBuf)
+    glVertexPointer(3, GL_FLOAT, 0, None)
+    if colorBuf is not None:
+        glEnableClientState(GL_COLOR_ARRAY)
+        glBindBuffer(GL_ARRAY_BUFFER, colorBuf)
+        glColorPointer(3, GL_FLOAT, 0, None)
+    glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, indexBuf)
+    glDrawElements(mode, count, GL_UNSIGNED_INT, None)
+    glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+    glBindBuffer(GL_ARRAY_BUFFER, 0)
+    glDisableClientState(GL_VERTEX_ARRAY)
+    if colorBuf is not None:
+        glDisableClientState(GL_COLOR_ARRAY)
+
+
+class FrameProfiler(object):
+    """
+    Keeps the last capacity frame times, split into named phases, in a ring
+    buffer. Frames are delimited by endFrame, so a frame time is the full
+    interval between frames, and time spent outside of any phase shows up
+    as "other". Stutters are frames taking more than stutter times the
+    median frame.
+    """
+
+    PHASES = ("update", "upload", "draw", "swap")
+
+    def __init__(self, phases=PHASES, capacity=1024, stutter=2.0):
+        self.phases = list(phases)
+        self.stutter = stutter
+        # Columns are the phases, then other, then the whole frame.
+        self.times = np.zeros((capacity, len(self.phases) + 2))
+        self.current = np.zeros(len(self.phases))
+        self.count = 0
+        self.last = None
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.current[self.phases.index(name)] += time.perf_counter() - start
+
+    def endFrame(self):
+        now = time.perf_counter()
+        if self.last is not None:
+            row = self.times[self.count % len(self.times)]
+            row[:-2] = self.current
+            row[-1] = now - self.last
+            row[-2] = max(row[-1] - self.current.sum(), 0.0)
+            self.count += 1
+        self.current[:] = 0.0
+        self.last = now
+
+    def frameTimes(self):
+        """(frames, phases + 2) seconds of the buffered frames, oldest first."""
+        n = min(self.count, len(self.times))
+        start = self.count % len(self.times) if self.count > len(self.times) else 0
+        return np.roll(self.times, -start, axis=0)[:n]
+
+    def summary(self):
+        times = self.frameTimes()
+        if not len(times):
+            return {}
+        stats = dict()
+        for k, name in enumerate(self.phases + ["other", "frame"]):
+            p50, p95, p99 = np.percentile(times[:, k], [50, 95, 99]) * 1000.0
+            stats[name] = {
+                "mean": times[:, k].mean() * 1000.0,
+                "p50": p50,
+                "p95": p95,
+                "p99": p99,
+            }
+        frame = times[:, -1]
+        stats["frames"] = len(times)
+        stats["stutters"] = int(np.sum(frame > self.stutter * np.median(frame)))
+        return stats
+
+    def report(self):
+        stats = self.summary()
+        if not stats:
+            return
+        print(f"{'ms':>8} {'mean':>8} {'p50':>8} {'p95':>8} {'p99':>8}")
+        for name in self.phases + ["other", "frame"]:
+            s = stats[name]
+            print(
+                f"{name:>8} {s['mean']:8.3f} {s['p50']:8.3f} {s['p95']:8.3f} {s['p99']:8.3f}"
+            )
+        print(f"{stats['stutters']} stutters in {stats['frames']} frames")
+
+    def export(self, path):
+        """Writes the buffered frame times (and summary, for .json) to path."""
+        columns = self.phases + ["other", "frame"]
+        times = self.frameTimes()
+        if path.endswith(".json"):
+            with open(path, "w") as f:
+                json.dump(
+                    {
+                        "columns": columns,
+                        "seconds": times.tolist(),
+                        "summary": self.summary(),
+                    },
+                    f,
+                    indent=1,
+                )
+        else:
+            with open(path, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(columns)
+                writer.writerows(times.tolist())
+        print(f"Wrote {len(times)} frame times to {path}")
 
 
 class GLBase(object):
@@ -198,15 +249,17 @@ class GLBase(object):
     # so instead of saying: ESCAPE = 27, we use the following.
     ESCAPE = b"\x1b"
 
-    def __init__(self, title, width, height):
+    def __init__(self, title, width, height, backend=BACKEND):
         # Number of the glut window.
         self.title = title
+        self.backend = backend
         self.width = width
         self.height = height
         self.window = 0
         self.init = False
         self.t0 = time.time()
         self.frames = 0
+        self.profiler = FrameProfiler()
 
     # A general OpenGL initialization function.  Sets all of the initial parameters.
     def initGL(self):  # We call this right after our OpenGL window is created.
@@ -224,7 +277,7 @@ class GLBase(object):
         glMatrixMode(GL_MODELVIEW)
         glLoadIdentity()  # Reset The Projection Matrix
 
-        gluPerspective(45.0, float(self.width) / float(self.height), 0.1, 100.0)
+        gluPerspective(FOVY, float(self.width) / float(self.height), NEAR, FAR)
 
     # The function called when our window is resized (which shouldn't happen if you enable fullscreen, below)
     def reSizeGLScene(self, width, height):
@@ -238,7 +291,7 @@ class GLBase(object):
         )  # Reset The Current Viewport And Perspective Transformation
         glMatrixMode(GL_PROJECTION)
         glLoadIdentity()
-        gluPerspective(45.0, float(self.width) / float(self.height), 0.1, 100.0)
+        gluPerspective(FOVY, float(self.width) / float(self.height), NEAR, FAR)
         glMatrixMode(GL_MODELVIEW)
 
     # The main drawing function.
@@ -293,28 +346,46 @@ class GLBase(object):
         self.rquad -= 1.0  # Decrease The Rotation Variable For The Quad
 
         #  since this is double buffered, swap the buffers to display what just got drawn.
-        glutSwapBuffers()
+        self.swapBuffers()
         self.framerate()
 
+    def swapBuffers(self):
+        with self.profiler.phase("swap"):
+            if self.backend == "glut":
+                glutSwapBuffers()
+            else:
+                self.readFrame()
+
     # The function called whenever a key is pressed. Note the use of Python tuples to pass in: (key, x, y)
     def keyPressed(*args):
         # print(args[1])
         # If escape is pressed, kill everything.
         if args[1] == GLBase.ESCAPE:
+            args[0].stop()
             glutLeaveMainLoop()
             sys.exit(0)
 
+    def stop(self):
+        self.profiler.report()
+        if TRACE:
+            self.profiler.export(TRACE)
+
     def framerate(self):
+        self.profiler.endFrame()
         t = time.time()
         self.frames += 1
         if t - self.t0 >= 5.0:
             seconds = t - self.t0
             fps = self.frames / seconds
             print(f"{self.frames} frames in {seconds:3.1f} seconds = {fps:6.3f} FPS")
+            self.profiler.report()
             self.t0 = t
             self.frames = 0
 
-    def run(self):
+    def run(self, frames=FRAMES, outputs=OUTPUTS, seed=0):
+        if self.backend != "glut":
+            return self.runOffscreen(frames, outputs, seed)
+
         glutInit(sys.argv)
 
         # Select type of Display mode:
@@ -358,6 +429,149 @@ class GLBase(object):
         # Start Event Processing Engine
         glutMainLoop()
 
+    def createContext(self):
+        # A context without any window, rendering goes to the framebuffer
+        # object made in createFramebuffer
+        if self.backend == "egl":
+            from OpenGL import EGL
+
+            display = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+            if not EGL.eglInitialize(display, None, None):
+                raise RuntimeError("Could not initialize EGL")
+            attribs = (EGL.EGLint * 5)(
+                EGL.EGL_RENDERABLE_TYPE,
+                EGL.EGL_OPENGL_BIT,
+                EGL.EGL_SURFACE_TYPE,
+                EGL.EGL_PBUFFER_BIT,
+                EGL.EGL_NONE,
+            )
+            config, count = EGL.EGLConfig(), EGL.EGLint()
+            EGL.eglChooseConfig(
+                display, attribs, ctypes.pointer(config), 1, ctypes.pointer(count)
+            )
+            if not count.value:
+                raise RuntimeError("No EGL config for desktop OpenGL")
+            EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+            context = EGL.eglCreateContext(display, config, EGL.EGL_NO_CONTEXT, None)
+            size = (EGL.EGLint * 5)(EGL.EGL_WIDTH, 1, EGL.EGL_HEIGHT, 1, EGL.EGL_NONE)
+            surface = EGL.eglCreatePbufferSurface(display, config, size)
+            if not EGL.eglMakeCurrent(display, surface, surface, context):
+                raise RuntimeError("Could not make the EGL context current")
+            self.context = (display, surface, context)
+        elif self.backend == "osmesa":
+            from OpenGL import osmesa, arrays
+
+            context = osmesa.OSMesaCreateContextExt(osmesa.OSMESA_RGBA, 24, 0, 0, None)
+            buf = arrays.GLubyteArray.zeros((self.height, self.width, 4))
+            if not osmesa.OSMesaMakeCurrent(
+                context, buf, GL_UNSIGNED_BYTE, self.width, self.height
+            ):
+                raise RuntimeError("Could not make the OSMesa context current")
+            self.context = (context, buf)
+        else:
+            raise ValueError(f"Unknown backend {self.backend}")
+        print(
+            f"{self.backend}: {glGetString(GL_RENDERER).decode()}, OpenGL {glGetString(GL_VERSION).decode()}"
+        )
+
+    def createFramebuffer(self):
+        self.fbo = glGenFramebuffers(1)
+        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+        color, depth = glGenRenderbuffers(2)
+        glBindRenderbuffer(GL_RENDERBUFFER, color)
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_RGBA8, self.width, self.height)
+        glFramebufferRenderbuffer(
+            GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_RENDERBUFFER, color
+        )
+        glBindRenderbuffer(GL_RENDERBUFFER, depth)
+        glRenderbufferStorage(
+            GL_RENDERBUFFER, GL_DEPTH_COMPONENT24, self.width, self.height
+        )
+        glFramebufferRenderbuffer(
+            GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, GL_RENDERBUFFER, depth
+        )
+        if glCheckFramebufferStatus(GL_FRAMEBUFFER) != GL_FRAMEBUFFER_COMPLETE:
+            raise RuntimeError("Offscreen framebuffer is incomplete")
+
+        # Two pixel buffers: glReadPixels into one returns at once, while the
+        # previous frame is mapped from the other, so reading back never
+        # waits for the frame that was just drawn
+        self.pbos = glGenBuffers(2)
+        for pbo in self.pbos:
+            glBindBuffer(GL_PIXEL_PACK_BUFFER, pbo)
+            glBufferData(
+                GL_PIXEL_PACK_BUFFER, self.width * self.height * 4, None, GL_STREAM_READ
+            )
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        self.pending = None
+
+    def readFrame(self):
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, self.pbos[self.frame % 2])
+        glReadPixels(
+            0, 0, self.width, self.height, GL_RGBA, GL_UNSIGNED_BYTE, ctypes.c_void_p(0)
+        )
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        self.flushFrame()
+        self.pending = self.pbos[self.frame % 2]
+        self.frame += 1
+
+    def flushFrame(self):
+        # Copies the previously read frame out of its pixel buffer into the sink
+        if self.pending is None:
+            return
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, self.pending)
+        ptr = glMapBuffer(GL_PIXEL_PACK_BUFFER, GL_READ_ONLY)
+        size = self.width * self.height * 4
+        pixels = np.ctypeslib.as_array((ctypes.c_ubyte * size).from_address(ptr))
+        # OpenGL rows start at the bottom
+        self.sink.buffer()[:] = pixels.reshape(self.height, self.width, 4)[::-1, :, :3]
+        glUnmapBuffer(GL_PIXEL_PACK_BUFFER)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        self.sink.write()
+        self.pending = None
+
+    def runOffscreen(self, frames, outputs=(), seed=0):
+        """
+        Renders frames frames at width x height without a window and streams
+        them to outputs (see framesink.openSink, a path ending in / dumps
+        PNG files). The random generators are seeded, so every run draws
+        the same frames and the frames per second numbers are comparable.
+        """
+        if not frames:
+            raise ValueError("Offscreen rendering needs a number of frames")
+        random.seed(seed)
+        np.random.seed(seed)
+        self.createContext()
+        self.createFramebuffer()
+        self.initGL()
+        self.reSizeGLScene(self.width, self.height)
+        self.frame = 0
+        self.sink = openSink(outputs, self.width, self.height)
+
+        start = time.perf_counter()
+        for _ in range(frames):
+            self.drawGLScene()
+        self.flushFrame()
+        glFinish()
+        seconds = time.perf_counter() - start
+        self.sink.close()
+        self.stop()
+
+        stats = {
+            "backend": self.backend,
+            "width": self.width,
+            "height": self.height,
+            "frames": frames,
+            "seconds": seconds,
+            "fps": frames / seconds,
+            "profile": self.profiler.summary(),
+        }
+        print(
+            f"{frames} offscreen frames of {self.width}x{self.height} in "
+            f"{seconds:3.2f} seconds = {stats['fps']:6.3f} FPS"
+        )
+        return stats
+
 
 def main():
     glBaseObj = GLBase("test", 640, 480)
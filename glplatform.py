@@ -0,0 +1,28 @@
+# Created on Oct 19 2026
+# License is MIT, see COPYING.txt for more details.
+# @author: Theodore John McCormack
+
+"""
+Picks the PyOpenGL platform of the GLBASE_BACKEND. PyOpenGL settles on its
+platform the first time it is imported, so every module using OpenGL
+imports this one, or glbase which does, before any OpenGL module.
+"""
+
+import os
+import sys
+
+# "glut" opens a window, "egl" (surfaceless) and "osmesa" render offscreen
+# without a display.
+BACKEND = os.environ.get("GLBASE_BACKEND", "glut")
+if BACKEND in ("egl", "osmesa"):
+    os.environ.setdefault("PYOPENGL_PLATFORM", BACKEND)
+    os.environ.setdefault("EGL_PLATFORM", "surfaceless")
+
+if "OpenGL.platform" in sys.modules and BACKEND in ("egl", "osmesa"):
+    platform = type(sys.modules["OpenGL.platform"].PLATFORM).__module__
+    if platform != "OpenGL.platform." + BACKEND:
+        raise ImportError(
+            "PyOpenGL was imported with the %s platform before glplatform, "
+            "GLBASE_BACKEND=%s needs glplatform imported first"
+            % (platform.rsplit(".", 1)[-1], BACKEND)
+        )
@@ -0,0 +1,111 @@
+# Created on Oct 19 2026
+# License is MIT, see COPYING.txt for more details.
+# @author: Theodore John McCormack
+
+import matplotlib.pyplot as plt
+import numpy as np
+from zia import Zia
+from density import DensityRaster
+
+BURN_IN = 32
+CHAOS_WALKERS = 100000
+
+
+class ZiaIFS(object):
+    """
+    Iterated function system with one affine map per Zia point,
+
+        f_i(z) = scale_i * R(rotation_i) z + (x_i, y_i)
+
+    so every map places a scaled, rotated copy of the attractor at its Zia
+    point. scale and rotation can be scalars or one value per point, and the
+    maps are picked with probability proportional to their area scaling
+    unless probs is given. With one uniform scale s and no rotation,
+    expand(2) is the first level of ziafract.fract at scale s.
+    """
+
+    def __init__(self, xpts, ypts, scale, rotation=0.0, probs=None):
+        self.t = np.column_stack((xpts, ypts)).astype(np.float64)
+        n = len(self.t)
+        scale = np.broadcast_to(np.asarray(scale, dtype=np.float64), (n,))
+        rotation = np.broadcast_to(np.asarray(rotation, dtype=np.float64), (n,))
+        cos, sin = np.cos(rotation), np.sin(rotation)
+        self.A = np.empty((n, 2, 2))
+        self.A[:, 0, 0] = scale * cos
+        self.A[:, 0, 1] = -scale * sin
+        self.A[:, 1, 0] = scale * sin
+        self.A[:, 1, 1] = scale * cos
+        if probs is None:
+            probs = np.abs(np.linalg.det(self.A))
+            probs = np.maximum(probs, 1e-3 * probs.max())
+        self.probs = np.asarray(probs, dtype=np.float64) / np.sum(probs)
+
+    @classmethod
+    def fromZia(cls, zia, scale, rotation=0.0, probs=None):
+        xpts, ypts = zia.genZia()
+        return cls(xpts, ypts, scale, rotation, probs)
+
+    def __len__(self):
+        return len(self.t)
+
+    def expand(self, depth):
+        """
+        Deterministic expansion: all len(self)**depth compositions of depth
+        maps applied to the origin, built one level at a time with
+        broadcasting. Memory grows as len(self)**depth, use chaos for deep
+        attractors.
+        """
+        pts = np.zeros((1, 2))
+        for _ in range(depth):
+            pts = (np.einsum("nij,mj->nmi", self.A, pts) + self.t[:, None, :]).reshape(
+                -1, 2
+            )
+        return pts[:, 0], pts[:, 1]
+
+    def chaos(self, walkers=CHAOS_WALKERS, burnIn=BURN_IN, seed=None):
+        """
+        Vectorized chaos game. Runs walkers points in parallel, every step
+        applying an independently chosen map to each of them, and after
+        burnIn steps (when they sit on the attractor to well below a pixel)
+        yields their positions as an (x, y) chunk per step, forever. Memory
+        stays at walkers points however many are drawn.
+        """
+        rng = np.random.default_rng(seed)
+        pts = rng.uniform(-1.0, 1.0, size=(walkers, 2))
+        step = 0
+        while True:
+            inds = rng.choice(len(self), size=walkers, p=self.probs)
+            pts = np.einsum("kij,kj->ki", self.A[inds], pts) + self.t[inds]
+            step += 1
+            if step > burnIn:
+                yield pts[:, 0], pts[:, 1]
+
+    def sample(self, npts, walkers=CHAOS_WALKERS, burnIn=BURN_IN, seed=None):
+        """Chaos game chunks holding npts points in total."""
+        walkers = min(walkers, npts)
+        left = npts
+        for xpts, ypts in self.chaos(walkers, burnIn, seed):
+            if left <= 0:
+                return
+            yield xpts[:left], ypts[:left]
+            left -= walkers
+
+
+def main():
+    ziaObj = Zia(1.0, 2.0, 1, rayN=5, sunN=4)
+    xpts, ypts = ziaObj.genZia()
+    # Turn every copy to face outwards along its ray.
+    ifs = ZiaIFS(xpts, ypts, 0.05, rotation=np.arctan2(ypts, xpts) - np.pi / 2)
+
+    raster = DensityRaster(1000, 1000, (-3.5, 3.5, -3.5, 3.5))
+    raster.addChunks(ifs.sample(20000000))
+    print("Binned %d chaos game points." % raster.npts)
+
+    fig, ax = plt.subplots()
+    plt.axis("off")
+    ax.imshow(raster.image("gamma", gamma=0.3), cmap="gray_r")
+    plt.show()
+
+
+if __name__ == "__main__":
+    main()
@@ -13,16 +13,23 @@ Julia and Mandelbrot fractals image creation
 """
 
 from __future__ import division, print_function
+import os
+import json
+import socket
 import sys
+import threading
 import time
+import uuid
 from itertools import takewhile
-import pylab, argparse, collections, inspect, functools
+import pylab, argparse, collections, contextlib, inspect, functools
 from mpl_toolkits.mplot3d import Axes3D
 import matplotlib.pyplot as plt
 from matplotlib import cm
 import numpy as np
 import multiprocessing
 import cv2
+from stripwriter import encodeStrips
+import postproc
 
 Point = collections.namedtuple("Point", ["x", "y"])
 
@@ -31,6 +38,10 @@ def pair_reader(dtype):
     return lambda data: Point(*map(dtype, data.lower().split("x")))
 
 
+def auto_reader(dtype):
+    return lambda data: "auto" if data.lower() == "auto" else dtype(data)
+
+
 DEFAULT_SIZE = "512x512"
 DEFAULT_DEPTH = "256"
 DEFAULT_ZOOM = "1"
@@ -143,6 +154,407 @@ def get_model(model, depth, c):
     raise ValueError("Fractal not found")
 
 
+IIM_MAX_HITS = 4
+IIM_PRUNE_SIDE = 4096
+
+
+def julia_iim(
+    c,
+    size=pair_reader(int)(DEFAULT_SIZE),
+    depth=int(DEFAULT_DEPTH),
+    zoom=float(DEFAULT_ZOOM),
+    center=pair_reader(float)(DEFAULT_CENTER),
+    max_hits=IIM_MAX_HITS,
+):
+    """
+    Julia set boundary density by the modified inverse iteration method.
+    Starting from the repelling fixed point, every generation maps all
+    points back through both branches of ``z -> sqrt(z - c)`` at once.
+    A point is only expanded further while the cell of a pruning grid over
+    the whole set it falls in was visited fewer than ``max_hits`` times,
+    so the backward orbits spread over the boundary instead of piling up
+    where it attracts them. Visits inside the view are binned with the
+    same pixel mapping as ``generate_row``; ``depth`` caps the generations.
+    """
+    width, height = size
+    cx, cy = center
+    side = max(width, height)
+    sidem1 = side - 1
+    deltax = (side - width) / 2
+    deltay = (side - height) / 2
+
+    # The Julia set lies in the disc of this radius
+    radius = (1 + np.sqrt(1 + 4 * abs(c))) / 2
+    prune_side = int(min(IIM_PRUNE_SIDE, max(side * zoom * radius, side)))
+    visits = np.zeros(prune_side * prune_side, dtype=np.int32)
+    density = np.zeros(width * height, dtype=np.int64)
+
+    z = np.array([0.5 + np.sqrt(0.25 - c + 0j)])
+    for unused in range(depth):
+        z = np.sqrt(z - c)
+        z = np.concatenate((z, -z))
+
+        px = ((z.real + radius) * (prune_side / (2 * radius))).astype(np.int64)
+        py = ((z.imag + radius) * (prune_side / (2 * radius))).astype(np.int64)
+        cells = np.clip(py, 0, prune_side - 1) * prune_side + np.clip(
+            px, 0, prune_side - 1
+        )
+        # Rank of every point among the points of this generation in its
+        # cell, so a cell takes at most the visits it has left.
+        order = np.argsort(cells, kind="stable")
+        sorted_cells = cells[order]
+        first = np.searchsorted(sorted_cells, sorted_cells)
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order)) - first
+        keep = visits[cells] + rank < max_hits
+        z, cells = z[keep], cells[keep]
+        if not len(z):
+            break
+        visits += np.bincount(cells, minlength=len(visits)).astype(np.int32)
+
+        col = np.round(((z.real - cx) * zoom + 1) * sidem1 / 2 - deltax).astype(
+            np.int64
+        )
+        row = np.round(
+            height + deltay - ((z.imag - cy) * zoom + 1) * sidem1 / 2
+        ).astype(np.int64)
+        inside = (col >= 0) & (col < width) & (row >= 0) & (row < height)
+        density += np.bincount(
+            row[inside] * width + col[inside], minlength=len(density)
+        )
+    return density.reshape(height, width).astype(np.float64)
+
+
+TILE_ROWS = 64
+# Workers refresh the locks of their tiles this often (seconds), and a lock
+# left without a refresh for LOCK_STALE is taken as left behind by a dead
+# worker, however long its tile takes to render
+LOCK_HEARTBEAT = 30
+LOCK_STALE = 300
+HOST = socket.gethostname()
+
+
+def _tile_path(checkpoint, tile, ext):
+    return os.path.join(checkpoint, "tile_%05d%s" % (tile, ext))
+
+
+def _update_manifest(checkpoint, update):
+    """
+    Calls ``update`` on the manifest dictionary (None when there is none
+    yet) and atomically writes back what it returns. Workers on any host
+    share the manifest through a lock file next to it.
+    """
+    path = os.path.join(checkpoint, "manifest.json")
+    lock = path + ".lock"
+    while True:
+        try:
+            fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock) > 60:
+                    os.remove(lock)  # its holder died while writing
+            except OSError:
+                pass
+            time.sleep(0.01)
+    try:
+        manifest = None
+        if os.path.exists(path):
+            with open(path) as f:
+                manifest = json.load(f)
+        manifest = update(manifest)
+        tmp = "%s.%s.%d.tmp" % (path, HOST, os.getpid())
+        with open(tmp, "w") as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+        os.replace(tmp, path)
+    finally:
+        os.close(fd)
+        os.remove(lock)
+    return manifest
+
+
+def _set_tile(checkpoint, tile, record):
+    def update(manifest):
+        manifest["tiles"][str(tile)] = record
+        return manifest
+
+    _update_manifest(checkpoint, update)
+
+
+def _read_lock(lock):
+    """Owner of a tile lock, None when it is gone or still being written."""
+    try:
+        with open(lock) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _lock_stale(lock, owner):
+    """Whether the lock missed its heartbeats or its owner process is gone."""
+    try:
+        stale = time.time() - os.path.getmtime(lock) > LOCK_STALE
+    except FileNotFoundError:
+        return False
+    if owner is not None and owner["host"] == HOST:
+        try:
+            os.kill(owner["pid"], 0)
+        except ProcessLookupError:
+            stale = True
+        except PermissionError:
+            pass
+    return stale
+
+
+def _take_over(checkpoint, tile, lock, owner):
+    """
+    Removes the stale lock of owner and records the tile as abandoned, in
+    the manifest lock so other workers taking it over at the same time
+    wait. The lock is read again there and left alone when it changed,
+    another worker may already have removed it and locked the tile.
+    """
+
+    def update(manifest):
+        current = _read_lock(lock)
+        if (current or {}).get("token") != (owner or {}).get("token"):
+            return manifest
+        if not _lock_stale(lock, current):
+            return manifest
+        try:
+            os.remove(lock)
+        except FileNotFoundError:
+            return manifest
+        print("Taking over tile", tile, "from", owner or "an unwritten lock")
+        manifest["tiles"][str(tile)] = {"status": "abandoned", "owner": owner}
+        return manifest
+
+    _update_manifest(checkpoint, update)
+
+
+def _claim_tile(checkpoint, tile):
+    """
+    Takes the lock of a tile, or a stale one, and returns its owner record
+    (with a token only this claim has), or None when another worker holds
+    it. A stale lock is recorded as abandoned in the manifest.
+    """
+    lock = _tile_path(checkpoint, tile, ".lock")
+    for unused in range(2):
+        try:
+            fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            owner = _read_lock(lock)
+            if not _lock_stale(lock, owner):
+                return None
+            _take_over(checkpoint, tile, lock, owner)
+            continue
+        owner = {
+            "host": HOST,
+            "pid": os.getpid(),
+            "started": time.time(),
+            "token": uuid.uuid4().hex,
+        }
+        with os.fdopen(fd, "w") as f:
+            json.dump(owner, f)
+        return owner
+    return None
+
+
+def _release_tile(lock, owner):
+    """Removes the lock if it is still ours, it may have been taken over."""
+    current = _read_lock(lock)
+    if current is None or current.get("token") != owner["token"]:
+        return
+    try:
+        os.remove(lock)
+    except FileNotFoundError:
+        pass
+
+
+@contextlib.contextmanager
+def _heartbeat(lock, owner):
+    """Refreshes the lock every LOCK_HEARTBEAT seconds while it is ours."""
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(LOCK_HEARTBEAT):
+            current = _read_lock(lock)
+            if current is None or current.get("token") != owner["token"]:
+                return
+            try:
+                os.utime(lock)
+            except FileNotFoundError:
+                return
+
+    thread = threading.Thread(target=beat, daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def tile_worker(model, c, size, depth, zoom, center, shading, checkpoint, tile_rows):
+    """
+    Renders every tile (band of ``tile_rows`` rows) of the checkpoint that
+    is neither finished nor locked by a live worker, saving each as it is
+    done and recording its status and timing in the manifest. Tiles that
+    raise are recorded as failed, for a later run to pick up. Returns the
+    number of tiles it rendered.
+    """
+    ntiles = -(-size[1] // tile_rows)
+    done = 0
+    for tile in range(ntiles):
+        path = _tile_path(checkpoint, tile, ".npy")
+        if os.path.exists(path):
+            continue
+        owner = _claim_tile(checkpoint, tile)
+        if owner is None:
+            continue
+        lock = _tile_path(checkpoint, tile, ".lock")
+        try:
+            if os.path.exists(path):
+                continue  # finished while we were claiming it
+            rows = range(tile * tile_rows, min((tile + 1) * tile_rows, size[1]))
+            record = {
+                "status": "running",
+                "rows": [rows[0], rows[-1] + 1],
+                "host": HOST,
+                "pid": os.getpid(),
+                "started": owner["started"],
+            }
+            _set_tile(checkpoint, tile, record)
+            try:
+                with _heartbeat(lock, owner):
+                    band = np.array(
+                        [
+                            shaded_row(
+                                model, c, size, depth, zoom, center, shading, row
+                            )
+                            for row in rows
+                        ]
+                    )
+                tmp = _tile_path(
+                    checkpoint, tile, ".%s.%d.tmp.npy" % (HOST, os.getpid())
+                )
+                np.save(tmp, band)
+                os.replace(tmp, path)
+            except BaseException as error:
+                record["status"] = "failed"
+                record["error"] = repr(error)
+                _set_tile(checkpoint, tile, record)
+                raise
+            record["status"] = "done"
+            record["seconds"] = time.time() - record["started"]
+            _set_tile(checkpoint, tile, record)
+            done += 1
+        finally:
+            _release_tile(lock, owner)
+    return done
+
+
+def render_tiles(
+    model,
+    c,
+    size,
+    depth,
+    zoom,
+    center,
+    shading,
+    checkpoint,
+    tile_rows=TILE_ROWS,
+    num_procs=None,
+):
+    """
+    Escape time render persisted tile by tile into the ``checkpoint``
+    directory, next to a ``manifest.json`` with the render parameters and
+    the status, host and timing of every tile. Rerunning the same render
+    skips finished tiles, and running it on several hosts sharing the
+    directory splits the tiles between them through lock files, kept alive
+    by a heartbeat while their tile renders. Tiles of workers that died or
+    failed are rendered again. Waits for tiles other workers hold, then
+    assembles the field.
+    """
+    os.makedirs(checkpoint, exist_ok=True)
+    params = json.loads(
+        json.dumps(
+            {
+                "model": model,
+                "c": None if c is None else [c.real, c.imag],
+                "size": list(size),
+                "depth": depth,
+                "zoom": zoom,
+                "center": list(center),
+                "shading": shading,
+                "tile_rows": tile_rows,
+            }
+        )
+    )
+    ntiles = -(-size[1] // tile_rows)
+
+    def init(manifest):
+        if manifest is None:
+            return {"params": params, "tiles": {}}
+        if manifest["params"] != params:
+            raise ValueError(
+                "%s holds a different render: %s" % (checkpoint, manifest["params"])
+            )
+        # Tiles whose worker died without a trace are left to be rendered
+        for tile, record in manifest["tiles"].items():
+            lock = _tile_path(checkpoint, int(tile), ".lock")
+            if record["status"] == "running" and (
+                not os.path.exists(lock) or _lock_stale(lock, _read_lock(lock))
+            ):
+                record["status"] = "abandoned"
+        return manifest
+
+    _update_manifest(checkpoint, init)
+    missing = [
+        t
+        for t in range(ntiles)
+        if not os.path.exists(_tile_path(checkpoint, t, ".npy"))
+    ]
+    print(
+        "Checkpoint %s: %d of %d tiles done"
+        % (checkpoint, ntiles - len(missing), ntiles)
+    )
+
+    args = [model, c, size, depth, zoom, center, shading, checkpoint, tile_rows]
+    num_procs = num_procs or multiprocessing.cpu_count()
+    pool = multiprocessing.Pool(num_procs)
+    procs = [pool.apply_async(tile_worker, args) for unused in range(num_procs)]
+    print("Rendered %d tiles" % sum(proc.get() for proc in procs))
+    pool.close()
+
+    missing = [
+        t for t in missing if not os.path.exists(_tile_path(checkpoint, t, ".npy"))
+    ]
+    while missing:
+        print("Waiting for %d tiles of other workers..." % len(missing))
+        time.sleep(5)
+        tile_worker(*args)  # in case their workers died
+        missing = [
+            t for t in missing if not os.path.exists(_tile_path(checkpoint, t, ".npy"))
+        ]
+
+    img = np.empty((size[1], size[0]))
+    for tile in range(ntiles):
+        img[tile * tile_rows : (tile + 1) * tile_rows] = np.load(
+            _tile_path(checkpoint, tile, ".npy")
+        )
+    return img
+
+
+def row_chunksize(rows, num_procs, tuned_rows=None):
+    """
+    Rows a worker is handed at a time: enough for about four tasks per
+    worker, so none sits idle while others finish, and no more than the
+    calibrated ``tuned_rows``.
+    """
+    chunksize = -(-rows // (4 * num_procs))
+    return min(chunksize, tuned_rows) if tuned_rows else chunksize
+
+
 def generate_fractal(
     model,
     c=None,
@@ -150,36 +562,102 @@ def generate_fractal(
     depth=int(DEFAULT_DEPTH),
     zoom=float(DEFAULT_ZOOM),
     center=pair_reader(float)(DEFAULT_CENTER),
+    method="escape",
+    shading="counts",
+    checkpoint=None,
+    tile_rows=None,
+    procs="all",
 ):
     """
-    2D Numpy Array with the fractal value for each pixel coordinate.
+    2D Numpy Array with the fractal value for each pixel coordinate, the
+    escape counts or, with the ``iim`` method (julia only), the boundary
+    density from ``julia_iim``. The ``smooth`` and ``distance`` shadings
+    use the continuous fields of ``generate_row_fields`` instead of the
+    counts, which need no blur. With a ``checkpoint`` directory the
+    escape time render goes through ``render_tiles`` and can be resumed.
+
+    Workers get ``tile_rows`` rows at a time, by default about four tasks
+    each so they stay balanced, and checkpoints are tiled by ``TILE_ROWS``.
+    ``depth="auto"`` probes the view for the depth it needs and
+    ``procs="auto"`` takes the worker count and the rows per task from
+    the machine calibration of ``autotune`` for the row function that
+    will run, and its current load; "all" uses every CPU.
     """
-    num_procs = multiprocessing.cpu_count()
+    # The checkpoint tiles go through shaded_row, like the other shadings
+    kernel = "rows" if shading == "counts" and not checkpoint else "fields"
+    tuned_rows = None
+    if depth == "auto" or procs == "auto":
+        import autotune
+
+        if depth == "auto":
+            depth = autotune.probeDepth(model, c, zoom, center)
+        if procs == "auto":
+            num_procs, tuned_rows = autotune.tuneWorkers(size, kernel)
+    if procs == "all":
+        num_procs = multiprocessing.cpu_count()
+    elif procs != "auto":
+        try:
+            num_procs = int(procs)
+        except ValueError:
+            raise ValueError(
+                "procs is all, auto or a number of workers, not %r" % (procs,)
+            ) from None
+        if num_procs < 1:
+            raise ValueError("procs needs at least 1 worker, not %d" % num_procs)
     print("CPU Count:", num_procs)
+    chunksize = tile_rows or row_chunksize(size[1], num_procs, tuned_rows)
     start = time.time()
 
-    # Create a pool of workers, one for each row
-    pool = multiprocessing.Pool(num_procs)
-    procs = [
-        pool.apply_async(generate_row, [model, c, size, depth, zoom, center, row])
-        for row in range(size[1])
-    ]
-
-    # Generates the intensities for each pixel
-    img = pylab.array([row_proc.get() for row_proc in procs])
+    blur = True
+    if method == "iim":
+        if model != "julia":
+            raise ValueError("Inverse iteration only traces julia fractals")
+        img = julia_iim(c, size, depth, zoom, center)
+    elif checkpoint:
+        img = render_tiles(
+            model,
+            c,
+            size,
+            depth,
+            zoom,
+            center,
+            shading,
+            checkpoint,
+            # A checkpoint keeps its tiles whichever machine resumes it
+            tile_rows or TILE_ROWS,
+            num_procs,
+        )
+        blur = shading == "counts"
+    elif shading != "counts":
+        pool = multiprocessing.Pool(num_procs)
+        rows = [
+            (model, c, size, depth, zoom, center, shading, row)
+            for row in range(size[1])
+        ]
+        img = np.array(pool.starmap(shaded_row, rows, chunksize=chunksize))
+        blur = False
+    else:
+        # Create a pool of workers, handing them chunksize rows at a time
+        pool = multiprocessing.Pool(num_procs)
+        rows = [(model, c, size, depth, zoom, center, row) for row in range(size[1])]
+
+        # Generates the intensities for each pixel
+        img = pylab.array(pool.starmap(generate_row, rows, chunksize=chunksize))
 
     print("Fractal time taken:", time.time() - start)
     start = time.time()
 
-    # Place images
-    img = place_images(img, size, DEFAULT_SMALL_IMG, DEFAULT_LARGE_IMG)
+    # Place images, the field is not needed any more
+    img = place_images(
+        img, size, DEFAULT_SMALL_IMG, DEFAULT_LARGE_IMG, blur, inplace=True
+    )
 
     print("Image time taken:", time.time() - start)
 
     fig = plt.figure()
-    ax = fig.gca(projection="3d")
-    x = range(len(img))
-    y = range(len(img[0]))
+    ax = fig.add_subplot(projection="3d")
+    x = range(len(img[0]))
+    y = range(len(img))
     x2, y2 = pylab.meshgrid(x, y)
     surf = ax.plot_surface(x2, y2, img, cmap=cm.coolwarm, linewidth=0, antialiased=True)
 
@@ -188,36 +666,8 @@ def generate_fractal(
     return img
 
 
-def dist2(p1, p2):
-    return (p1[0] - p2[0]) ** 2 + (p1[1] - p2[1]) ** 2
-
-
 def fuse(points, scales, multiplier):
-    ret = []
-    indexes = list(range(len(scales)))
-    indexes.sort(key=scales.__getitem__, reverse=True)
-    points = list(map(points.__getitem__, indexes))
-    scales = list(map(scales.__getitem__, indexes))
-
-    n = len(points)
-    taken = [False] * n
-    for i in range(n):
-        if not taken[i]:
-            count = 1
-            point = [points[i][0], points[i][1]]
-            taken[i] = True
-            d2 = multiplier * scales[i]
-            d2 *= d2
-            for j in range(i + 1, n):
-                if dist2(points[i], points[j]) < d2:
-                    point[0] += points[j][0]
-                    point[1] += points[j][1]
-                    count += 1
-                    taken[j] = True
-            point[0] /= count
-            point[1] /= count
-            ret.append([int(point[0]), int(point[1])])
-    return np.array(ret)
+    return postproc.fusePeaks(points, scales, multiplier)
 
 
 MIN_FOR_PEAK = 0.4
@@ -226,10 +676,27 @@ MIN_ZIA_SIZE = 35
 ZIA_SCALE = 150
 
 
-def place_images(img, size, imagesmall, imagebig):
-    blurx, blury = int(size[0] / 200.0), int(size[0] / 200.0)
-    img = cv2.blur(img, (blurx, blury))
-    img = np.sqrt(img)
+DEFAULT_PLACED_IMG = "imgs/juliaziafract.png"
+
+
+def place_images(
+    img,
+    size,
+    imagesmall,
+    imagebig,
+    blur=True,
+    output=DEFAULT_PLACED_IMG,
+    inplace=False,
+):
+    # Blurred (optionally) and square rooted in one pass, into a copy, or
+    # into img itself with inplace when it is a float64 field
+    kernel = None
+    if blur:
+        blurx, blury = int(size[0] / 200.0), int(size[0] / 200.0)
+        kernel = (blurx, blury)
+    img, vmax = postproc.runStrips(
+        np.asarray(img), [postproc.sqrt()], blur=kernel, inplace=inplace
+    )
 
     def read_image(path):
         imageimg = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
@@ -239,14 +706,9 @@ def place_images(img, size, imagesmall, imagebig):
     imagesmall = read_image(imagesmall)
     imagebig = read_image(imagebig)
 
-    scaledimg = img / np.max(img)
-    orig = np.array(scaledimg)
-    peaks = np.argwhere((scaledimg >= MIN_FOR_PEAK))
-
-    peakscales = list()
-    for peak in peaks:
-        scale = scaledimg[peak[0]][peak[1]]
-        peakscales.append(scale)
+    # Peaks of the image scaled to a maximum of 1, without scaling it
+    peaks, peakscales = postproc.findPeaks(img, MIN_FOR_PEAK * vmax)
+    peakscales /= vmax
     peaks = fuse(peaks, peakscales, RADIAL_MULTIPLIER)
     if len(peaks) % 2 == 1:
         peaks = peaks[:-1]
@@ -265,7 +727,7 @@ def place_images(img, size, imagesmall, imagebig):
             diff -= 1
         y1 = int(cy - diff / 2)
         y2 = int(cy + diff / 2)
-        return max(x1, 0), min(x2, size[0]), max(y1, 0), min(y2, size[1])
+        return max(x1, 0), min(x2, img.shape[0]), max(y1, 0), min(y2, img.shape[1])
 
     def select_box(img, cx, cy, mag, s):
         x1, x2, y1, y2 = get_xy(cx, cy, mag, s)
@@ -273,28 +735,24 @@ def place_images(img, size, imagesmall, imagebig):
 
     def replace_box(img, repl, cx, cy, mag, s):
         x1, x2, y1, y2 = get_xy(cx, cy, mag, s)
-        for i, x in enumerate(range(x1, x2)):
-            for j, y in enumerate(range(y1, y2)):
-                img[x][y] += repl[i][j]
+        img[x1:x2, y1:y2] += repl
         return img
 
-    mask = np.zeros(orig.shape)
+    mask = np.zeros(img.shape)
     imageimg = imagesmall
     for peak in peaks:
-        scale = scaledimg[peak[0]][peak[1]]
+        scale = img[peak[0], peak[1]] / vmax
         subbox = select_box(mask, peak[0], peak[1], scale, ZIA_SCALE)
         # print(subbox.shape)
-        if subbox.shape[0] <= MIN_ZIA_SIZE:
+        if subbox.shape[0] <= MIN_ZIA_SIZE or not subbox.shape[1]:
             continue
         subbox = np.transpose(cv2.resize(imageimg, subbox.shape, cv2.INTER_CUBIC))
         mask = replace_box(mask, subbox, peak[0], peak[1], scale, ZIA_SCALE)
 
-    img = mask * img
-    # print(np.max(img))
-    # print(np.std(img[img>0]))
-    # print(np.min(img[img>0]))
-
-    img = np.power(img, 0.3)
+    # img is ours (or given up with inplace) by now
+    img, vmax = postproc.runStrips(
+        img, [postproc.maskMultiply(mask), postproc.gamma(0.3)], inplace=True
+    )
     fig, ax = plt.subplots()
     plt.axis("off")
     plt.tight_layout()
@@ -305,17 +763,14 @@ def place_images(img, size, imagesmall, imagebig):
     # # for row in img:
     # 	print(row)
     plt.imshow(img, cmap="gray")
-    plt.savefig("imgs/juliaziafract.png", dpi=size[0])
+    if output:
+        encodeStrips(img, [(output, "gray")])
     plt.show()
     return img
 
 
 def threshold_img(img, cutoff):
-    for i in range(len(img)):
-        for j in range(len(img[0])):
-            if img[i][j] <= cutoff:
-                img[i][j] = 0
-    return img
+    return postproc.runStrips(img, [postproc.threshold(cutoff)], out=img)[0]
 
 
 def generate_row(model, c, size, depth, zoom, center, row):
@@ -335,18 +790,116 @@ def generate_row(model, c, size, depth, zoom, center, row):
     ]
 
 
-def img2output(img, cmap=DEFAULT_COLORMAP, output=None, show=False):
-    """Plots and saves the desired fractal raster image"""
+SMOOTH_BAILOUT = 2**8
+# Iterations allowed past depth for escaped orbits to reach SMOOTH_BAILOUT
+BAILOUT_STEPS = 16
+
+
+def generate_row_fields(model, c, size, depth, zoom, center, row):
+    """
+    Escape time fields of a single row, computed for all its pixels at once
+    while tracking the derivative of the orbit. Returns three arrays:
+
+    * the escape counts, the values ``generate_row`` gives;
+    * smooth (normalized) iteration counts, continuous across the count
+      bands and ``depth`` where the orbit never escapes;
+    * exterior distance estimates to the fractal in pixels, 0 inside.
+
+    Escaped orbits are followed past radius 2 up to ``SMOOTH_BAILOUT`` so
+    that both continuous fields are accurate.
+    """
+    width, height = size
+    cx, cy = center
+    side = max(width, height)
+    sidem1 = side - 1
+    deltax = (side - width) / 2  # Centralize
+    deltay = (side - height) / 2
+    y = (2 * (height - row + deltay) / sidem1 - 1) / zoom + cy
+    x = (2 * (np.arange(width) + deltax) / sidem1 - 1) / zoom + cx
+    pixel = x + y * 1j
+    if model == "julia":
+        z, dz, add, dadd = pixel, np.ones(width, dtype=complex), np.full(width, c), 0
+    elif model == "mandelbrot":
+        z, dz, add, dadd = (
+            np.zeros(width, dtype=complex),
+            np.zeros(width, dtype=complex),
+            pixel,
+            1,
+        )
+    else:
+        raise ValueError("Fractal not found")
+
+    counts = np.full(width, depth)
+    smooth = np.full(width, float(depth))
+    distance = np.zeros(width)
+    # Pixels still iterating, and which of them are still below radius 2
+    active = np.arange(width)
+    counting = np.ones(width, dtype=bool)
+    for n in range(depth + BAILOUT_STEPS):
+        abs2 = z.real**2 + z.imag**2
+        if n < depth:
+            escaped = counting & (abs2 >= 4)
+            counts[active[escaped]] = n
+            counting &= ~escaped
+        done = ~counting & (abs2 >= SMOOTH_BAILOUT**2)
+        inds, absz = active[done], np.sqrt(abs2[done])
+        smooth[inds] = np.maximum(n - np.log2(np.log(absz) / np.log(2)), 0)
+        distance[inds] = (
+            0.5 * absz * np.log(absz) / np.abs(dz[done]) * zoom * sidem1 / 2
+        )
+        # Past depth the orbits still below radius 2 are inside
+        keep = ~done & ~(counting & (n >= depth))
+        active, z, dz, add, counting = (
+            active[keep],
+            z[keep],
+            dz[keep],
+            add[keep],
+            counting[keep],
+        )
+        if not len(active):
+            break
+        dz = 2 * z * dz + dadd
+        z = z**2 + add
+    # Orbits lingering between radius 2 and the bailout keep their count
+    smooth[active[~counting]] = counts[active[~counting]]
+    return counts, smooth, distance
+
+
+def shaded_row(model, c, size, depth, zoom, center, shading, row):
+    """The field of ``generate_row_fields`` a row is shaded with."""
+    counts, smooth, distance = generate_row_fields(
+        model, c, size, depth, zoom, center, row
+    )
+    if shading == "smooth":
+        return smooth
+    if shading == "distance":
+        # Closeness to the boundary in pixels, 1 on and inside it
+        return 1 / (1 + distance)
+    return counts
+
+
+def img2output(img, cmap=DEFAULT_COLORMAP, output=None, show=False, bits=8):
+    """
+    Plots and saves the desired fractal raster image. ``cmap`` can be a
+    comma separated list of colormaps, then each one is saved next to
+    ``output`` with its name appended, all from the same render.
+    """
+    cmaps = cmap.split(",")
     if output:
-        pylab.imsave(output, img, cmap=cmap)
+        if len(cmaps) == 1:
+            outputs = [(output, cmap)]
+        else:
+            root, ext = os.path.splitext(output)
+            outputs = [("%s_%s%s" % (root, name, ext), name) for name in cmaps]
+        encodeStrips(np.asarray(img), outputs, bits)
     if show:
-        pylab.imshow(img, cmap=cmap)
+        pylab.imshow(img, cmap=cmaps[0])
         pylab.show()
 
 
 def call_kw(func, kwargs):
     """Call func(**kwargs) but remove the possible unused extra keys before"""
-    keys = inspect.getargspec(func).args
+    keys = inspect.getfullargspec(func).args
     kwfiltered = dict((k, v) for k, v in kwargs.items() if k in keys)
     return func(**kwfiltered)
 
@@ -394,8 +947,9 @@ def cli_parse_args(args=None, namespace=None):
         "-d",
         "--depth",
         default=DEFAULT_DEPTH,
-        type=int,
-        help="Iteration depth, the step count limit",
+        type=auto_reader(int),
+        help="Iteration depth, the step count limit, or auto to probe "
+        "the view for the depth it needs",
     )
     parser.add_argument(
         "-z",
@@ -413,11 +967,54 @@ def cli_parse_args(args=None, namespace=None):
         type=pair_reader(float),
         help="Central point in the image",
     )
+    parser.add_argument(
+        "--method",
+        default="escape",
+        choices=["escape", "iim"],
+        help="Escape time for every pixel, or inverse iteration tracing "
+        "only the julia boundary into a density image",
+    )
+    parser.add_argument(
+        "--shading",
+        default="counts",
+        choices=["counts", "smooth", "distance"],
+        help="Field the images are placed on: blurred escape counts, "
+        "smooth iteration counts or closeness from the exterior distance "
+        "estimate (escape method only)",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        default=argparse.SUPPRESS,
+        help="Directory the escape time render is saved to tile by tile, "
+        "rerunning resumes it and several hosts can share it",
+    )
+    parser.add_argument(
+        "--tile-rows",
+        default=argparse.SUPPRESS,
+        type=int,
+        help="Rows per checkpoint tile and per worker task, by default "
+        "%d per tile and about four tasks per worker" % TILE_ROWS,
+    )
+    parser.add_argument(
+        "--procs",
+        default="all",
+        help="Worker processes: all (one per CPU), a number, or auto for "
+        "the calibrated count (and tile rows) given the current load",
+    )
     parser.add_argument(
         "-m",
         "--cmap",
         default=DEFAULT_COLORMAP,
-        help="Matplotlib colormap name to be used",
+        help="Matplotlib colormap name to be used, or several separated "
+        "by commas to save one output per colormap",
+    )
+    parser.add_argument(
+        "--bits",
+        default=8,
+        type=int,
+        choices=[8, 16],
+        help="Bits per color sample of the output, 16 for PNG and TIFF "
+        "with a 65536 entry colormap",
     )
     parser.add_argument(
         "-o",
@@ -445,6 +1042,9 @@ def cli_parse_args(args=None, namespace=None):
             ns_parsed.c = complex("".join(ns_parsed.c).replace("i", "j"))
         except ValueError as exc:
             parser.error(exc)
+    if ns_parsed.procs not in ("all", "auto"):
+        if not ns_parsed.procs.isdigit() or int(ns_parsed.procs) < 1:
+            parser.error("--procs is all, auto or a number of workers from 1 up")
 
     return vars(ns_parsed)
 
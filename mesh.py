@@ -0,0 +1,237 @@
+# Created on Oct 19 2026
+# License is MIT, see COPYING.txt for more details.
+# @author: Theodore John McCormack
+
+import numpy as np
+
+# This cube was taken from
+# http://www.opengl-tutorial.org/beginners-tutorials/tutorial-4-a-colored-cube/
+CUBE = [
+    -1.0,
+    -1.0,
+    -1.0,  # triangle 1 : begin
+    -1.0,
+    -1.0,
+    1.0,
+    -1.0,
+    1.0,
+    1.0,  # triangle 1 : end
+    1.0,
+    1.0,
+    -1.0,  # triangle 2 : begin
+    -1.0,
+    -1.0,
+    -1.0,
+    -1.0,
+    1.0,
+    -1.0,  # triangle 2 : end
+    1.0,
+    -1.0,
+    1.0,
+    -1.0,
+    -1.0,
+    -1.0,
+    1.0,
+    -1.0,
+    -1.0,
+    1.0,
+    1.0,
+    -1.0,
+    1.0,
+    -1.0,
+    -1.0,
+    -1.0,
+    -1.0,
+    -1.0,
+    -1.0,
+    -1.0,
+    -1.0,
+    -1.0,
+    1.0,
+    1.0,
+    -1.0,
+    1.0,
+    -1.0,
+    1.0,
+    -1.0,
+    1.0,
+    -1.0,
+    -1.0,
+    1.0,
+    -1.0,
+    -1.0,
+    -1.0,
+    -1.0,
+    1.0,
+    1.0,
+    -1.0,
+    -1.0,
+    1.0,
+    1.0,
+    -1.0,
+    1.0,
+    1.0,
+    1.0,
+    1.0,
+    1.0,
+    -1.0,
+    -1.0,
+    1.0,
+    1.0,
+    -1.0,
+    1.0,
+    -1.0,
+    -1.0,
+    1.0,
+    1.0,
+    1.0,
+    1.0,
+    -1.0,
+    1.0,
+    1.0,
+    1.0,
+    1.0,
+    1.0,
+    1.0,
+    -1.0,
+    -1.0,
+    1.0,
+    -1.0,
+    1.0,
+    1.0,
+    1.0,
+    -1.0,
+    1.0,
+    -1.0,
+    -1.0,
+    1.0,
+    1.0,
+    1.0,
+    1.0,
+    1.0,
+    -1.0,
+    1.0,
+    1.0,
+    1.0,
+    -1.0,
+    1.0,
+]
+
+# (36, 3) vertices of the 12 triangles of a unit cube centered at the origin.
+CUBE_VERTS = np.array(CUBE, dtype=np.float32).reshape(-1, 3)
+
+
+def getCubeArray(xpt, ypt, zpt, size):
+    """Flat vertex array of one cube of half side size at (xpt, ypt, zpt)."""
+    return (size * CUBE_VERTS.astype(np.float64) + (xpt, ypt, zpt)).ravel()
+
+
+def getCubeArrays(centers, size, out=None):
+    """
+    Flat float32 vertex array of one cube of half side size at every row of
+    the (N, 3) centers, the same as concatenating getCubeArray for each of
+    them. The cube template is broadcast against the centers straight into
+    out (or a new buffer of N * 108 floats), so nothing is concatenated.
+    """
+    centers = np.asarray(centers, dtype=np.float32).reshape(-1, 3)
+    if out is None:
+        out = np.empty(len(centers) * CUBE_VERTS.size, dtype=np.float32)
+    np.add(
+        centers[:, None, :],
+        np.float32(size) * CUBE_VERTS[None, :, :],
+        out=out.reshape(len(centers), len(CUBE_VERTS), 3),
+    )
+    return out
+
+
+def getCubeColors(arr, out=None):
+    """Colors of a cube vertex array, the absolute value of every vertex."""
+    return np.abs(arr, out=out)
+
+
+# Corner c of a unit cube has x, y and z from its bits 0, 1 and 2.
+CUBE_CORNERS = np.array(
+    [[(c & 1) * 2 - 1, (c >> 1 & 1) * 2 - 1, (c >> 2 & 1) * 2 - 1] for c in range(8)],
+    dtype=np.float32,
+)
+# Two triangles per face, counter clockwise seen from outside, with faces in
+# the order -x, +x, -y, +y, -z, +z so face 2 * axis + 1 points along +axis.
+CUBE_FACES = np.array(
+    [
+        [[0, 4, 6], [0, 6, 2]],
+        [[1, 3, 7], [1, 7, 5]],
+        [[0, 1, 5], [0, 5, 4]],
+        [[2, 6, 7], [2, 7, 3]],
+        [[0, 2, 3], [0, 3, 1]],
+        [[4, 5, 7], [4, 7, 6]],
+    ],
+    dtype=np.uint32,
+)
+
+
+def _gridKeys(points, eps):
+    return np.round(np.asarray(points, dtype=np.float64) / eps).astype(np.int64)
+
+
+def hiddenFaces(centers, size, eps):
+    """
+    (N, 6) mask of the cube faces that lie inside a neighbouring cube of the
+    same size. Only cubes lined up along an axis can cover a whole face, so
+    for every axis the cubes are sorted into lines along it and the faces
+    between neighbours on a line less than 2 * size apart are hidden.
+    """
+    keys = _gridKeys(centers, eps)
+    hidden = np.zeros((len(centers), 6), dtype=bool)
+    for axis in range(3):
+        b, c = [k for k in range(3) if k != axis]
+        order = np.lexsort((keys[:, axis], keys[:, c], keys[:, b]))
+        first, second = order[:-1], order[1:]
+        sameLine = (keys[first, b] == keys[second, b]) & (
+            keys[first, c] == keys[second, c]
+        )
+        gap = centers[second, axis] - centers[first, axis]
+        covered = sameLine & (gap <= 2 * size + eps)
+        hidden[first[covered], 2 * axis + 1] = True
+        hidden[second[covered], 2 * axis] = True
+    return hidden
+
+
+def indexedCubes(centers, size, tol=1e-6):
+    """
+    Indexed mesh of cubes of half side size at the (N, 3) centers, instead
+    of 36 separate vertices per cube: duplicate cubes are dropped, faces
+    covered by a neighbouring cube are culled, and coincident corners
+    (within tol * size) are merged. Returns float32 (V, 3) vertices and
+    colors (abs of the vertex, as getCubeColors), uint32 triangle indices
+    and a dict of triangle counts and bytes before and after.
+    """
+    centers = np.asarray(centers, dtype=np.float64).reshape(-1, 3)
+    eps = tol * size
+    unique = np.sort(np.unique(_gridKeys(centers, eps), axis=0, return_index=True)[1])
+    cubes = centers[unique]
+
+    visible = ~hiddenFaces(cubes, size, eps)
+    cube, face = np.nonzero(visible)
+    # Corner ids cube * 8 + corner of every kept triangle.
+    tris = (cube[:, None, None] * 8 + CUBE_FACES[face]).reshape(-1)
+
+    used, tris = np.unique(tris, return_inverse=True)
+    corners = cubes[used // 8] + size * CUBE_CORNERS[used % 8]
+    merged, remap = np.unique(
+        _gridKeys(corners, eps), axis=0, return_index=True, return_inverse=True
+    )[1:]
+    vertices = corners[merged].astype(np.float32)
+    indices = remap.reshape(-1)[tris].astype(np.uint32)
+    colors = getCubeColors(vertices)
+
+    stats = {
+        "cubes": len(centers),
+        "unique cubes": len(cubes),
+        "triangles before": 12 * len(centers),
+        "triangles after": len(indices) // 3,
+        "vertices before": 36 * len(centers),
+        "vertices after": len(vertices),
+        "bytes before": 2 * 36 * len(centers) * 3 * 4,
+        "bytes after": vertices.nbytes + colors.nbytes + indices.nbytes,
+    }
+    return vertices, colors, indices, stats
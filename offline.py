@@ -0,0 +1,121 @@
+# Created on Oct 19 2026
+# License is MIT, see COPYING.txt for more details.
+# @author: Theodore John McCormack
+
+import json
+import multiprocessing
+import os
+import time
+import numpy as np
+from PIL import Image
+from framesink import openSink
+
+FRAME_NAME = "frame_%05d.png"
+MANIFEST_NAME = "manifest.json"
+
+# Set in every worker process by _initWorker, since the render callables
+# returned by the setup functions are closures that cannot be pickled.
+_render = None
+
+
+def _initWorker(setup, setupArgs):
+    global _render
+    _render = setup(*setupArgs)
+
+
+def _renderFrame(job):
+    i, view, path = job
+    start = time.time()
+    rgb = _render(view)
+    # Write then rename, so an interrupted render never leaves a partial
+    # frame behind that a resumed run would take as finished.
+    tmp = path + ".tmp.png"
+    Image.fromarray(rgb).save(tmp)
+    os.replace(tmp, path)
+    return i, time.time() - start
+
+
+def _checkManifest(frameDir, setup, setupArgs, views, params):
+    """
+    Writes the render parameters to the manifest of frameDir, or checks
+    them against the one already there so frames of another render are
+    never reused.
+    """
+    manifest = json.loads(
+        json.dumps(
+            {
+                "setup": "%s.%s" % (setup.__module__, setup.__qualname__),
+                "setupArgs": setupArgs,
+                "params": params,
+                "views": [np.asarray(view).tolist() for view in views],
+            },
+            default=lambda o: np.asarray(o).tolist(),
+        )
+    )
+    path = os.path.join(frameDir, MANIFEST_NAME)
+    if os.path.exists(path):
+        with open(path) as f:
+            if json.load(f) != manifest:
+                raise ValueError(
+                    "%s holds frames of a different render, remove it or "
+                    "use another frame directory" % frameDir
+                )
+        return
+    if any(name.endswith(".png") for name in os.listdir(frameDir)):
+        raise ValueError("%s holds frames without a manifest" % frameDir)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def renderFrames(setup, setupArgs, views, frameDir, procs=None, params=None):
+    """
+    Renders one frame per view across a process pool. setup(*setupArgs) is
+    called once per worker and returns a function mapping a view, usually
+    (xmin, xmax, ymin, ymax), to a uint8 (height, width, 3) array. Frames are
+    written to frameDir as they finish and frames already there are skipped,
+    so an interrupted render resumes where it stopped. A manifest of the
+    setup, its arguments, the views and any other params the frames depend
+    on is kept next to them, and a ValueError is raised instead of resuming
+    a different render. Returns the frame paths in order.
+    """
+    os.makedirs(frameDir, exist_ok=True)
+    _checkManifest(frameDir, setup, setupArgs, views, params)
+    paths = [os.path.join(frameDir, FRAME_NAME % i) for i in range(len(views))]
+    jobs = [
+        (i, view, path)
+        for i, (view, path) in enumerate(zip(views, paths))
+        if not os.path.exists(path)
+    ]
+    print(f"Rendering {len(jobs)} of {len(views)} frames into {frameDir}...")
+    if not jobs:
+        return paths
+
+    procs = procs or multiprocessing.cpu_count()
+    start = time.time()
+    with multiprocessing.Pool(procs, _initWorker, (setup, setupArgs)) as pool:
+        for n, (i, seconds) in enumerate(pool.imap_unordered(_renderFrame, jobs)):
+            print(f"Frame {i} done in {seconds:.2f} s ({n + 1} of {len(jobs)})")
+    print(f"Rendered {len(jobs)} frames in {time.time() - start:.1f} s")
+    return paths
+
+
+def encodeFrames(paths, outputs, fps=30):
+    """Reads every frame once and streams it to all outputs, see framesink."""
+    width, height = Image.open(paths[0]).size
+    with openSink(outputs, width, height, fps) as sink:
+        frame = sink.buffer()
+        for path in paths:
+            with Image.open(path) as image:
+                frame[:] = np.asarray(image.convert("RGB"))
+            sink.write()
+
+
+def renderOffline(
+    setup, setupArgs, views, frameDir, outputs, fps=30, procs=None, params=None
+):
+    """Renders the views in parallel, then encodes them once into all outputs."""
+    paths = renderFrames(setup, setupArgs, views, frameDir, procs, params)
+    encodeFrames(paths, outputs, fps)
+    return paths
@@ -0,0 +1,159 @@
+# Created on Oct 19 2026
+# License is MIT, see COPYING.txt for more details.
+# @author: Theodore John McCormack
+
+import os
+import numpy as np
+
+STORE_LEVELS = 8
+WRITE_CHUNK = 1 << 22
+
+
+def _part1by1(v):
+    """Spreads the low 16 bits of v so there is a zero bit between each."""
+    v = v.astype(np.uint32) & 0x0000FFFF
+    v = (v | (v << 8)) & 0x00FF00FF
+    v = (v | (v << 4)) & 0x0F0F0F0F
+    v = (v | (v << 2)) & 0x33333333
+    v = (v | (v << 1)) & 0x55555555
+    return v
+
+
+def mortonCodes(xpts, ypts, bounds, levels=STORE_LEVELS):
+    """Z-order codes of the points on a 2^levels x 2^levels grid over bounds."""
+    xmin, xmax, ymin, ymax = bounds
+    side = 1 << levels
+    ix = np.clip(((xpts - xmin) * (side / (xmax - xmin))).astype(np.int64), 0, side - 1)
+    iy = np.clip(((ypts - ymin) * (side / (ymax - ymin))).astype(np.int64), 0, side - 1)
+    return _part1by1(ix) | (_part1by1(iy) << 1)
+
+
+class PointStore(object):
+    """
+    Point cloud on disk, sorted in Z-order so that every quadtree node is a
+    contiguous run of points. The store is a directory with
+
+        points.npy  float64 (N, 2) array, memory-mapped read only
+        index.npz   bounds, levels and starts, where the points of leaf
+                    (chunk) code c are points[starts[c]:starts[c + 1]]
+
+    A node at level l with code p covers the leaves p * 4^(levels - l) up to
+    (p + 1) * 4^(levels - l), so the leaf prefix sums index the whole tree.
+    Queries return views into the memory map, nothing is read from disk but
+    the chunks that meet the view.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        index = np.load(os.path.join(path, "index.npz"))
+        self.bounds = tuple(index["bounds"])
+        self.levels = int(index["levels"])
+        self.starts = index["starts"]
+        self.points = np.load(os.path.join(path, "points.npy"), mmap_mode="r")
+
+    def __len__(self):
+        return len(self.points)
+
+    @classmethod
+    def write(cls, path, xpts, ypts, levels=STORE_LEVELS):
+        """Sorts the points in Z-order and writes them as a store at path."""
+        os.makedirs(path, exist_ok=True)
+        bounds = (np.min(xpts), np.max(xpts), np.min(ypts), np.max(ypts))
+        codes = mortonCodes(xpts, ypts, bounds, levels)
+        order = np.argsort(codes, kind="stable")
+        counts = np.bincount(codes, minlength=1 << (2 * levels))
+        starts = np.concatenate(([0], np.cumsum(counts)))
+        del codes
+
+        points = np.lib.format.open_memmap(
+            os.path.join(path, "points.npy"),
+            mode="w+",
+            dtype=np.float64,
+            shape=(len(order), 2),
+        )
+        for i in range(0, len(order), WRITE_CHUNK):
+            inds = order[i : i + WRITE_CHUNK]
+            points[i : i + len(inds), 0] = xpts[inds]
+            points[i : i + len(inds), 1] = ypts[inds]
+        points.flush()
+        del points
+        np.savez(
+            os.path.join(path, "index.npz"),
+            bounds=np.array(bounds),
+            levels=levels,
+            starts=starts,
+        )
+        return cls(path)
+
+    def nodeBox(self, level, ix, iy):
+        xmin, xmax, ymin, ymax = self.bounds
+        side = 1 << level
+        dx, dy = (xmax - xmin) / side, (ymax - ymin) / side
+        return (
+            xmin + ix * dx,
+            xmin + (ix + 1) * dx,
+            ymin + iy * dy,
+            ymin + (iy + 1) * dy,
+        )
+
+    def ranges(self, view):
+        """Merged [start, end) point ranges of the quadtree nodes meeting view."""
+        out = list()
+
+        def visit(level, ix, iy):
+            code = int(_part1by1(np.array(ix)) | (_part1by1(np.array(iy)) << 1))
+            span = 1 << (2 * (self.levels - level))
+            start, end = self.starts[code * span], self.starts[(code + 1) * span]
+            if start == end:
+                return
+            box = self.nodeBox(level, ix, iy)
+            if (
+                box[1] < view[0]
+                or view[1] < box[0]
+                or box[3] < view[2]
+                or view[3] < box[2]
+            ):
+                return
+            inside = (
+                view[0] <= box[0]
+                and box[1] <= view[1]
+                and view[2] <= box[2]
+                and box[3] <= view[3]
+            )
+            if inside or level == self.levels:
+                if out and out[-1][1] == start:
+                    out[-1][1] = end
+                else:
+                    out.append([start, end])
+                return
+            # Children in Z-order keep the ranges sorted, so they can merge.
+            for cy in (0, 1):
+                for cx in (0, 1):
+                    visit(level + 1, 2 * ix + cx, 2 * iy + cy)
+
+        visit(0, 0, 0)
+        return out
+
+    def count(self, view):
+        """Number of points in the quadtree nodes meeting view."""
+        return sum(end - start for start, end in self.ranges(view))
+
+    def query(self, view, clip=True, step=1):
+        """
+        Yields (x, y) chunks of the points in view = (xmin, xmax, ymin, ymax),
+        keeping every step-th point. Without clip the chunks are zero-copy
+        views of whole quadtree nodes, which may hold points just outside
+        view.
+        """
+        for start, end in self.ranges(view):
+            pts = self.points[start:end:step]
+            xpts, ypts = pts[:, 0], pts[:, 1]
+            if clip:
+                inside = (
+                    (xpts >= view[0])
+                    & (xpts <= view[1])
+                    & (ypts >= view[2])
+                    & (ypts <= view[3])
+                )
+                xpts, ypts = xpts[inside], ypts[inside]
+            yield xpts, ypts
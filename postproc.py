@@ -0,0 +1,127 @@
+# Created on Oct 19 2026
+# License is MIT, see COPYING.txt for more details.
+# @author: Theodore John McCormack
+
+"""
+In place post-processing of fractal fields. The operators below return
+callables op(strip, start) that modify a strip of rows starting at row
+start in place, and runStrips chains them over an image one strip at a
+time, so a whole chain makes one pass over memory without full size
+temporaries.
+"""
+
+import cv2
+import numpy as np
+
+STRIP_ROWS = 256
+
+
+def threshold(cutoff):
+    """Zeroes the values at or below cutoff."""
+
+    def op(strip, start):
+        np.putmask(strip, strip <= cutoff, 0)
+
+    return op
+
+
+def normalize(vmax):
+    def op(strip, start):
+        np.multiply(strip, 1.0 / vmax, out=strip)
+
+    return op
+
+
+def gamma(power):
+    def op(strip, start):
+        np.power(strip, power, out=strip)
+
+    return op
+
+
+def sqrt():
+    def op(strip, start):
+        np.sqrt(strip, out=strip)
+
+    return op
+
+
+def maskMultiply(mask):
+    """Multiplies by the rows of a full size mask."""
+
+    def op(strip, start):
+        np.multiply(strip, mask[start : start + len(strip)], out=strip)
+
+    return op
+
+
+def runStrips(img, ops, out=None, blur=None, rows=STRIP_ROWS, inplace=False):
+    """
+    Runs ops on img one strip of rows at a time, writing the float64 result
+    to out, a new array by default, or img itself with inplace when it is
+    float64. blur = (kx, ky) first box blurs every strip from the source
+    rows around it, the same as cv2.blur of the whole image in its dtype.
+    Returns out and its maximum.
+    """
+    height = len(img)
+    if out is None:
+        inplace = inplace and img.dtype == np.float64
+        out = img if inplace else np.empty(img.shape)
+    # Rows the blur reads above and below a strip; the ones above are kept
+    # as they were, since working in place has overwritten them by then.
+    halo = blur[1] // 2 + 1 if blur else 0
+    above = img[:0].copy()
+    vmax = -np.inf
+    for start in range(0, height, rows):
+        end = min(start + rows, height)
+        target = out[start:end]
+        if blur:
+            window = np.concatenate((above, img[start : min(end + halo, height)]))
+            strip = cv2.blur(window, blur)[len(above) : len(above) + end - start]
+            above = window[: len(above) + end - start][-halo:].copy()
+            target[...] = strip
+        elif out is not img:
+            target[...] = img[start:end]
+        for op in ops:
+            op(target, start)
+        vmax = max(vmax, target.max())
+    return out, vmax
+
+
+def findPeaks(img, cutoff, rows=STRIP_ROWS):
+    """Row, column indices of the values at or above cutoff, and the values."""
+    peaks, values = list(), list()
+    for start in range(0, len(img), rows):
+        strip = img[start : start + rows]
+        inds = np.argwhere(strip >= cutoff)
+        values.append(strip[inds[:, 0], inds[:, 1]])
+        inds[:, 0] += start
+        peaks.append(inds)
+    if not peaks:
+        return np.zeros((0, 2), dtype=np.intp), np.zeros(0)
+    return np.concatenate(peaks), np.concatenate(values)
+
+
+def fusePeaks(points, scales, multiplier):
+    """
+    Greedily merges peaks, largest scale first: every peak not merged yet
+    takes the mean of itself and all later peaks closer than multiplier
+    times its scale (merged or not, as before). Each merge is one
+    vectorized distance test against the remaining peaks.
+    """
+    order = np.argsort(-np.asarray(scales), kind="stable")
+    points = np.asarray(points, dtype=np.float64)[order]
+    scales = np.asarray(scales)[order]
+    taken = np.zeros(len(points), dtype=bool)
+    ret = []
+    for i in range(len(points)):
+        if taken[i]:
+            continue
+        d2 = ((points[i + 1 :] - points[i]) ** 2).sum(axis=1)
+        near = np.concatenate(([True], d2 < (multiplier * scales[i]) ** 2))
+        taken[i:][near] = True
+        group = points[i:][near]
+        ret.append(
+            [int(group[:, 0].sum() / len(group)), int(group[:, 1].sum() / len(group))]
+        )
+    return np.array(ret)
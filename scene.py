@@ -0,0 +1,302 @@
+# Created on Oct 19 2026
+# License is MIT, see COPYING.txt for more details.
+# @author: Theodore John McCormack
+
+import numpy as np
+from zia import Zia
+
+# glbase goes before OpenGL, it picks the PyOpenGL platform
+from glbase import (
+    FOVY,
+    NEAR,
+    FAR,
+    createBuffer,
+    compileProgram,
+    hasInstancing,
+    drawArrayBuffer,
+)
+from mesh import getCubeArrays, getCubeColors
+from OpenGL.GL import *
+
+# Instances per BVH leaf
+LEAF_SIZE = 8
+# An instance whose bounding sphere spans at least LOD_PIXELS[0] pixels on
+# screen is drawn with the full mesh, at least LOD_PIXELS[1] with the coarse
+# mesh and anything smaller as a single point.
+LOD_PIXELS = (150.0, 25.0)
+# The coarse mesh keeps every COARSE_STEP-th point with cubes this much bigger.
+COARSE_STEP = 8
+COARSE_GROW = 2.0
+POINT_SIZE = 2.0
+
+SCENE_VERTEX_SHADER = """
+#version 120
+attribute vec3 vertex;
+attribute vec3 color;
+attribute vec4 instance;
+varying vec3 fragColor;
+void main() {
+    fragColor = color;
+    gl_Position = gl_ModelViewProjectionMatrix * vec4(instance.xyz + instance.w * vertex, 1.0);
+}
+"""
+
+SCENE_FRAGMENT_SHADER = """
+#version 120
+varying vec3 fragColor;
+void main() {
+    gl_FragColor = vec4(fragColor, 1.0);
+}
+"""
+
+
+def perspective(fovy, aspect, near, far):
+    """The matrix gluPerspective multiplies onto the projection, row major."""
+    f = 1.0 / np.tan(np.radians(fovy) / 2.0)
+    return np.array(
+        [
+            [f / aspect, 0.0, 0.0, 0.0],
+            [0.0, f, 0.0, 0.0],
+            [0.0, 0.0, (far + near) / (near - far), 2.0 * far * near / (near - far)],
+            [0.0, 0.0, -1.0, 0.0],
+        ]
+    )
+
+
+def frustumPlanes(matrix):
+    """
+    (6, 4) planes (a, b, c, d) of the clip volume of a projection times
+    modelview matrix, left, right, bottom, top, near and far, normalized so
+    that a point p is inside when a p.x + b p.y + c p.z + d >= 0 for all of
+    them and the value is its distance to the plane.
+    """
+    m = np.asarray(matrix, dtype=np.float64)
+    planes = np.array(
+        [m[3] + m[0], m[3] - m[0], m[3] + m[1], m[3] - m[1], m[3] + m[2], m[3] - m[2]]
+    )
+    return planes / np.linalg.norm(planes[:, :3], axis=1)[:, None]
+
+
+def ziaHierarchy(xpts, ypts, levels, scale, depth=0.0):
+    """
+    Centers and scales of the instances of a 3D ziafract hierarchy. Level 0
+    is one instance at the origin, every instance of a level gets a child
+    instance at each of its (xpts, ypts) points scaled by scale, and depth
+    pushes children that far (in parent sizes) behind their parent.
+    """
+    offsets = np.column_stack((xpts, ypts, np.full(len(xpts), -depth)))
+    centers, scales = np.zeros((1, 3)), np.ones(1)
+    allCenters, allScales = [centers], [scales]
+    for _ in range(levels):
+        centers = (centers[:, None, :] + scales[:, None, None] * offsets).reshape(-1, 3)
+        scales = np.repeat(scales * scale, len(offsets))
+        allCenters.append(centers)
+        allScales.append(scales)
+    return np.concatenate(allCenters), np.concatenate(allScales)
+
+
+class BVH(object):
+    """
+    Bounding volume hierarchy over spheres, built top down by median splits
+    along the longest axis of each node. Nodes are kept in flat arrays (box
+    lo and hi, children, and the start and count of their spheres in order)
+    so culling walks the tree one level at a time over all nodes of that
+    level at once.
+    """
+
+    def __init__(self, centers, radii, leafSize=LEAF_SIZE):
+        self.centers = np.asarray(centers, dtype=np.float64)
+        self.radii = np.asarray(radii, dtype=np.float64)
+        order = np.arange(len(self.centers))
+        lo, hi, left, right, start, count = [], [], [], [], [], []
+        stack = [(0, len(order), -1, 0)]
+        while stack:
+            begin, end, parent, side = stack.pop()
+            node = len(lo)
+            if parent >= 0:
+                (left, right)[side][parent] = node
+            inds = order[begin:end]
+            boxLo = (self.centers[inds] - self.radii[inds, None]).min(axis=0)
+            boxHi = (self.centers[inds] + self.radii[inds, None]).max(axis=0)
+            lo.append(boxLo)
+            hi.append(boxHi)
+            left.append(-1)
+            right.append(-1)
+            start.append(begin)
+            count.append(end - begin)
+            if end - begin <= leafSize:
+                continue
+            axis = np.argmax(boxHi - boxLo)
+            mid = (end - begin) // 2
+            part = np.argpartition(self.centers[inds, axis], mid)
+            order[begin:end] = inds[part]
+            stack.append((begin + mid, end, node, 1))
+            stack.append((begin, begin + mid, node, 0))
+        self.order = order
+        self.lo, self.hi = np.array(lo), np.array(hi)
+        self.left, self.right = np.array(left), np.array(right)
+        self.start, self.count = np.array(start), np.array(count)
+
+    def __len__(self):
+        return len(self.lo)
+
+    def spheres(self, node):
+        """Indices of the spheres under node."""
+        return self.order[self.start[node] : self.start[node] + self.count[node]]
+
+    def cull(self, planes):
+        """Indices of the spheres meeting the frustum planes, see frustumPlanes."""
+        normals, offsets = planes[:, :3], planes[:, 3]
+        positive = normals >= 0
+        nodes = np.zeros(1, dtype=np.int64)
+        found = []
+        while len(nodes):
+            lo, hi = self.lo[nodes, None, :], self.hi[nodes, None, :]
+            # Corners furthest along and against every plane normal
+            far = (np.where(positive, hi, lo) * normals).sum(axis=2) + offsets
+            near = (np.where(positive, lo, hi) * normals).sum(axis=2) + offsets
+            meets = (far >= 0).all(axis=1)
+            inside = (near >= 0).all(axis=1)[meets]
+            nodes = nodes[meets]
+            leaf = self.left[nodes] < 0
+            # Whole nodes in view and partly visible leaves are taken as a
+            # run of spheres, the leaves then test every sphere.
+            for node in nodes[inside]:
+                found.append(self.spheres(node))
+            for node in nodes[~inside & leaf]:
+                inds = self.spheres(node)
+                dist = self.centers[inds] @ normals.T + offsets
+                found.append(inds[(dist >= -self.radii[inds, None]).all(axis=1)])
+            nodes = nodes[~inside & ~leaf]
+            nodes = np.concatenate((self.left[nodes], self.right[nodes]))
+        return np.concatenate(found) if found else np.zeros(0, dtype=np.int64)
+
+
+class ZiaScene(object):
+    """
+    Many instances of one Zia cube mesh, each a (center, scale) pair. Every
+    frame the instances are culled against the camera frustum with a BVH
+    and the visible ones are split by their size on screen into full mesh,
+    coarse mesh and point sprite levels of detail.
+    """
+
+    def __init__(self, centers, scales, zia=None, size=0.05):
+        self.zia = zia or Zia(1, 2, 1, npts=2000)
+        xpts, ypts = self.zia.genZia()
+        pts = np.column_stack((xpts, ypts, np.zeros_like(xpts)))
+        coarse = pts[::COARSE_STEP]
+        self.meshes = [
+            getCubeArrays(pts, size),
+            getCubeArrays(coarse, COARSE_GROW * size),
+        ]
+        self.colors = [getCubeColors(arr) for arr in self.meshes]
+        self.triangles = [len(arr) // 9 for arr in self.meshes]
+        self.centers = np.asarray(centers, dtype=np.float64)
+        self.scales = np.asarray(scales, dtype=np.float64)
+        radius = np.linalg.norm(pts, axis=1).max() + np.sqrt(3.0) * COARSE_GROW * size
+        self.bvh = BVH(self.centers, radius * self.scales)
+        self.buffers = None
+
+    @classmethod
+    def hierarchy(cls, levels=2, scale=0.1, depth=0.5, zia=None, size=0.05):
+        # Children go to the points of a sparse Zia, like ziafract does
+        xpts, ypts = Zia(1.0, 2.0, 1, rayN=5, sunN=4).genZia()
+        centers, scales = ziaHierarchy(xpts, ypts, levels, scale, depth)
+        return cls(centers, scales, zia, size)
+
+    def __len__(self):
+        return len(self.centers)
+
+    def select(self, modelview, aspect, height, fovy=FOVY, near=NEAR, far=FAR):
+        """
+        Instance indices per level of detail (full, coarse, points) for a
+        row major modelview matrix, and the frame statistics.
+        """
+        modelview = np.asarray(modelview, dtype=np.float64)
+        planes = frustumPlanes(perspective(fovy, aspect, near, far) @ modelview)
+        visible = self.bvh.cull(planes)
+        # Eye space depth of the visible centers gives their size on screen
+        depth = -(self.centers[visible] @ modelview[2, :3] + modelview[2, 3])
+        focal = height / (2.0 * np.tan(np.radians(fovy) / 2.0))
+        pixels = 2.0 * self.bvh.radii[visible] * focal / np.maximum(depth, near)
+        full = visible[pixels >= LOD_PIXELS[0]]
+        coarse = visible[(pixels < LOD_PIXELS[0]) & (pixels >= LOD_PIXELS[1])]
+        points = visible[pixels < LOD_PIXELS[1]]
+        stats = {
+            "instances": len(self),
+            "visible": len(visible),
+            "full": len(full),
+            "coarse": len(coarse),
+            "points": len(points),
+            "triangles": len(full) * self.triangles[0]
+            + len(coarse) * self.triangles[1],
+            "triangles all": len(self) * self.triangles[0],
+        }
+        return (full, coarse, points), stats
+
+    def initGL(self):
+        # Both meshes live on the card; instances are drawn with the shader
+        # when instancing is there, otherwise one draw call per instance.
+        self.buffers = [
+            (createBuffer(arr), createBuffer(col), len(arr) // 3)
+            for arr, col in zip(self.meshes, self.colors)
+        ]
+        self.instanced = hasInstancing()
+        if self.instanced:
+            self.program = compileProgram(SCENE_VERTEX_SHADER, SCENE_FRAGMENT_SHADER)
+            self.vertexLoc = glGetAttribLocation(self.program, "vertex")
+            self.colorLoc = glGetAttribLocation(self.program, "color")
+            self.instanceLoc = glGetAttribLocation(self.program, "instance")
+            self.instanceBuf = glGenBuffers(1)
+
+    def draw(self, aspect, height):
+        """Draws the scene with the current modelview matrix, returns the stats."""
+        if self.buffers is None:
+            self.initGL()
+        # OpenGL hands back the column major matrix
+        modelview = np.array(glGetDoublev(GL_MODELVIEW_MATRIX)).reshape(4, 4).T
+        (full, coarse, points), stats = self.select(modelview, aspect, height)
+        for inds, (arrBuf, colBuf, count) in zip((full, coarse), self.buffers):
+            if not len(inds):
+                continue
+            if self.instanced:
+                self.drawInstanced(inds, arrBuf, colBuf, count)
+                continue
+            for center, scale in zip(self.centers[inds], self.scales[inds]):
+                glPushMatrix()
+                glTranslatef(*center)
+                glScalef(scale, scale, scale)
+                drawArrayBuffer(arrBuf, count, colBuf)
+                glPopMatrix()
+        if len(points):
+            centers = self.centers[points].astype(np.float32)
+            glPointSize(POINT_SIZE)
+            glEnableClientState(GL_COLOR_ARRAY)
+            glEnableClientState(GL_VERTEX_ARRAY)
+            glColorPointer(3, GL_FLOAT, 0, np.abs(centers))
+            glVertexPointer(3, GL_FLOAT, 0, centers)
+            glDrawArrays(GL_POINTS, 0, len(centers))
+            glDisableClientState(GL_COLOR_ARRAY)
+            glDisableClientState(GL_VERTEX_ARRAY)
+        return stats
+
+    def drawInstanced(self, inds, arrBuf, colBuf, count):
+        instances = np.column_stack((self.centers[inds], self.scales[inds])).astype(
+            np.float32
+        )
+        glUseProgram(self.program)
+        glBindBuffer(GL_ARRAY_BUFFER, self.instanceBuf)
+        glBufferData(GL_ARRAY_BUFFER, instances.nbytes, instances, GL_STREAM_DRAW)
+        glEnableVertexAttribArray(self.instanceLoc)
+        glVertexAttribPointer(self.instanceLoc, 4, GL_FLOAT, GL_FALSE, 0, None)
+        glVertexAttribDivisor(self.instanceLoc, 1)
+        for loc, buf in ((self.vertexLoc, arrBuf), (self.colorLoc, colBuf)):
+            glEnableVertexAttribArray(loc)
+            glBindBuffer(GL_ARRAY_BUFFER, buf)
+            glVertexAttribPointer(loc, 3, GL_FLOAT, GL_FALSE, 0, None)
+        glDrawArraysInstanced(GL_TRIANGLES, 0, count, len(instances))
+        glVertexAttribDivisor(self.instanceLoc, 0)
+        for loc in (self.instanceLoc, self.vertexLoc, self.colorLoc):
+            glDisableVertexAttribArray(loc)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        glUseProgram(0)
@@ -0,0 +1,187 @@
+# Created on Oct 19 2026
+# License is MIT, see COPYING.txt for more details.
+# @author: Theodore John McCormack
+
+import os
+import struct
+import zlib
+import numpy as np
+from matplotlib import colormaps
+from matplotlib.colors import ListedColormap
+
+STRIP_ROWS = 256
+
+
+def colormapLUT(cmap="gray", bits=8):
+    """
+    (2**bits, 3) RGB lookup table of a Matplotlib colormap name, uint8 for
+    8 bits and uint16 for 16. With 8 bits entry i is the color Matplotlib
+    gives index i of a 256 color map, truncated to bytes the same way, so
+    images match pylab.imsave. With 16 bits the colormap is resampled to
+    the full table, segmented maps from their control points and listed
+    ones by interpolating between their colors, so it has 2**16 steps
+    instead of the 256 of the default map.
+    """
+    cmap = colormaps[cmap]
+    entries = 1 << bits
+    if bits == 8:
+        rgb = cmap(np.linspace(0.0, 1.0, entries))[:, :3]
+        return (rgb * 255).astype(np.uint8)
+    if isinstance(cmap, ListedColormap):
+        colors = cmap(np.arange(cmap.N))[:, :3]
+        x = np.linspace(0.0, cmap.N - 1, entries)
+        rgb = np.column_stack(
+            [np.interp(x, np.arange(cmap.N), colors[:, k]) for k in range(3)]
+        )
+    else:
+        rgb = cmap.resampled(entries)(np.arange(entries))[:, :3]
+    return np.round(rgb * 65535).astype(np.uint16)
+
+
+class PNGStripWriter(object):
+    """RGB PNG written strip by strip, deflated as the rows come in."""
+
+    def __init__(self, output, width, height, bits=8, rows=STRIP_ROWS):
+        self.output = output
+        self.bits = bits
+        self.file = open(output, "wb")
+        self.file.write(b"\x89PNG\r\n\x1a\n")
+        self._chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, bits, 2, 0, 0, 0))
+        self.deflate = zlib.compressobj(6)
+
+    def _chunk(self, kind, data):
+        self.file.write(struct.pack(">I", len(data)) + kind + data)
+        self.file.write(struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF))
+
+    def write(self, strip):
+        if self.bits == 16:
+            strip = strip.astype(">u2")
+        rows = strip.reshape(len(strip), -1).view(np.uint8)
+        # Every row starts with filter type 0, none
+        data = np.empty((len(rows), rows.shape[1] + 1), dtype=np.uint8)
+        data[:, 0] = 0
+        data[:, 1:] = rows
+        compressed = self.deflate.compress(data.tobytes())
+        if compressed:
+            self._chunk(b"IDAT", compressed)
+
+    def close(self):
+        self._chunk(b"IDAT", self.deflate.flush())
+        self._chunk(b"IEND", b"")
+        self.file.close()
+
+
+class TIFFStripWriter(object):
+    """
+    Uncompressed RGB TIFF, one TIFF strip per strip written. The strips go
+    to the file as they come and the directory pointing at them is written
+    last.
+    """
+
+    def __init__(self, output, width, height, bits=8, rows=STRIP_ROWS):
+        self.output = output
+        self.width, self.height, self.bits, self.rows = width, height, bits, rows
+        self.offsets, self.counts = list(), list()
+        self.file = open(output, "wb")
+        self.file.write(b"II*\x00" + struct.pack("<I", 0))
+
+    def write(self, strip):
+        data = strip.astype("<u2" if self.bits == 16 else np.uint8).tobytes()
+        self.offsets.append(self.file.tell())
+        self.counts.append(len(data))
+        self.file.write(data)
+
+    def close(self):
+        entries = list()
+        extra = b""
+
+        def tag(code, kind, values):
+            # kind 3 is SHORT and 4 is LONG, values over 4 bytes go after
+            # the strips with the entry holding their offset
+            nonlocal extra
+            fmt = "<%d%s" % (len(values), "H" if kind == 3 else "I")
+            data = struct.pack(fmt, *values)
+            if len(data) <= 4:
+                entries.append(
+                    struct.pack("<HHI", code, kind, len(values)) + data.ljust(4, b"\0")
+                )
+            else:
+                offset = self.file.tell() + len(extra)
+                extra += data
+                entries.append(struct.pack("<HHII", code, kind, len(values), offset))
+
+        tag(256, 4, [self.width])
+        tag(257, 4, [self.height])
+        tag(258, 3, [self.bits] * 3)
+        tag(259, 3, [1])  # no compression
+        tag(262, 3, [2])  # RGB
+        tag(273, 4, self.offsets)
+        tag(277, 3, [3])
+        tag(278, 4, [self.rows])
+        tag(279, 4, self.counts)
+        tag(284, 3, [1])  # interleaved samples
+        self.file.write(extra)
+        if self.file.tell() % 2:
+            self.file.write(b"\0")
+        ifd = self.file.tell()
+        self.file.write(struct.pack("<H", len(entries)) + b"".join(entries) + b"\0" * 4)
+        self.file.seek(4)
+        self.file.write(struct.pack("<I", ifd))
+        self.file.close()
+
+
+class RawStripWriter(object):
+    """Headerless interleaved RGB samples, row after row (16 bits little endian)."""
+
+    def __init__(self, output, width, height, bits=8, rows=STRIP_ROWS):
+        self.output = output
+        self.bits = bits
+        self.file = open(output, "wb")
+        print(f"Raw {width}x{height} RGB, {bits} bits per sample, in {output}")
+
+    def write(self, strip):
+        self.file.write(strip.astype("<u2" if self.bits == 16 else np.uint8).tobytes())
+
+    def close(self):
+        self.file.close()
+
+
+def openStripWriter(output, width, height, bits=8, rows=STRIP_ROWS):
+    """Strip writer by the extension of output, .png, .tif/.tiff or anything else raw."""
+    ext = os.path.splitext(output)[1].lower()
+    if ext == ".png":
+        return PNGStripWriter(output, width, height, bits, rows)
+    if ext in (".tif", ".tiff"):
+        return TIFFStripWriter(output, width, height, bits, rows)
+    return RawStripWriter(output, width, height, bits, rows)
+
+
+def encodeStrips(img, outputs, bits=8, rows=STRIP_ROWS, vmin=None, vmax=None):
+    """
+    Colormaps a 2D field into images without a figure. outputs is a list
+    of (path, cmap name) pairs, each gets its own lookup table. The field
+    is scaled linearly from vmin..vmax (its range by default) to a table
+    index one strip of rows at a time, and the indices of a strip are
+    shared by all outputs, so there is no full size temporary.
+    """
+    height, width = img.shape
+    vmin = np.min(img) if vmin is None else vmin
+    vmax = np.max(img) if vmax is None else vmax
+    entries = 1 << bits
+    scale = entries / (vmax - vmin) if vmax > vmin else 0.0
+    luts = [colormapLUT(cmap, bits) for unused, cmap in outputs]
+    writers = [
+        openStripWriter(path, width, height, bits, rows) for path, unused in outputs
+    ]
+    index = np.empty((min(rows, height), width), dtype=np.float64)
+    for start in range(0, height, rows):
+        strip = img[start : start + rows]
+        idx = index[: len(strip)]
+        np.subtract(strip, vmin, out=idx)
+        np.multiply(idx, scale, out=idx)
+        np.clip(idx, 0, entries - 1, out=idx)
+        idx = idx.astype(np.intp)
+        for lut, writer in zip(luts, writers):
+            writer.write(lut[idx])
+    for writer in writers:
+        writer.close()
@@ -0,0 +1,72 @@
+import json
+import numpy as np
+import pytest
+
+pytest.importorskip("cv2")
+import autotune
+import image_fractal
+
+
+@pytest.mark.parametrize(
+    "model, c, zoom, center",
+    [
+        ("julia", -0.75472 - 0.06592j, 0.6, (0.0, 0.0)),
+        ("mandelbrot", None, 1.0, (-0.5, 0.0)),
+    ],
+)
+def test_probe_counts_match_generate_row(model, c, zoom, center):
+    size, depth = (30, 20), 80
+    counts = autotune.probeCounts(model, c, size, depth, zoom, center)
+    expect = [
+        image_fractal.generate_row(model, c, size, depth, zoom, center, row)
+        for row in range(size[1])
+    ]
+    np.testing.assert_array_equal(counts.reshape(size[1], size[0]), expect)
+
+
+def test_probe_depth_grows_with_zoom():
+    shallow = autotune.probeDepth("mandelbrot", None, 1.0, (-0.5, 0.0))
+    deep = autotune.probeDepth("mandelbrot", None, 2000.0, (-0.7436, 0.1318))
+    assert shallow < deep <= autotune.PROBE_DEPTHS[-1]
+
+
+@pytest.mark.parametrize("kernel", sorted(autotune.KERNELS))
+def test_calibration_runs_the_kernel(monkeypatch, kernel):
+    monkeypatch.setitem(autotune.CALIBRATE_SIZES, kernel, (16, 16))
+    assert autotune._calibrationRun(kernel, 2, 4) > 0
+
+
+def test_tune_workers_caches_per_kernel(monkeypatch, tmp_path):
+    runs = list()
+
+    def run(kernel, workers, tile_rows):
+        runs.append(kernel)
+        # Fastest with one worker and the largest tiles, so the load and
+        # memory limits of availableWorkers cannot change the pick.
+        return tile_rows / workers
+
+    monkeypatch.setattr(autotune, "_calibrationRun", run)
+    cache = str(tmp_path / "autotune.json")
+    assert autotune.tuneWorkers((64, 64), "rows", cache) == (1, 64)
+    calls = len(runs)
+    assert set(runs) == {"rows"}
+    assert autotune.tuneWorkers((64, 64), "rows", cache) == (1, 64)
+    assert len(runs) == calls
+    autotune.tuneWorkers((64, 64), "fields", cache)
+    assert set(runs[calls:]) == {"fields"}
+    with open(cache) as f:
+        keys = sorted(json.load(f))
+    assert [key.rsplit(":", 1)[1] for key in keys] == ["fields", "rows"]
+
+
+def test_row_chunksize_keeps_every_worker_busy():
+    assert image_fractal.row_chunksize(1000, 8) == 32
+    assert image_fractal.row_chunksize(1000, 8, 16) == 16
+    assert image_fractal.row_chunksize(1000, 8, 64) == 32
+    assert image_fractal.row_chunksize(3, 8) == 1
+
+
+@pytest.mark.parametrize("procs", ["0", -2, "four", "2.5"])
+def test_generate_fractal_rejects_bad_procs(procs):
+    with pytest.raises(ValueError, match="procs"):
+        image_fractal.generate_fractal("mandelbrot", size=(8, 8), procs=procs)
@@ -0,0 +1,26 @@
+import tracemalloc
+import numpy as np
+from bench import MEM_BIG_BLOCK, MEM_METRICS, AllocationCounter, memOver
+
+
+def test_allocation_counter_sees_freed_arrays():
+    tracemalloc.start()
+    try:
+        with AllocationCounter() as counter:
+            for _ in range(5):
+                np.ones(MEM_BIG_BLOCK)  # freed right away
+            small = [np.ones(10) for _ in range(100)]
+    finally:
+        tracemalloc.stop()
+    assert counter.count == 5
+    assert counter.allocated >= 5 * MEM_BIG_BLOCK * 8
+    assert len(small) == 100
+
+
+def test_mem_over_allows_slack_on_small_stages():
+    base = dict.fromkeys(MEM_METRICS, 2 * 2**20)
+    # RSS jitter of a small stage is well over 10% but within the slack.
+    assert memOver(dict(base, **{"peak rss": 3 * 2**20}), base, 0.1) == []
+    assert memOver(dict(base, **{"peak rss": 8 * 2**20}), base, 0.1) == ["peak rss"]
+    big = dict.fromkeys(MEM_METRICS, 100 * 2**20)
+    assert memOver(dict(big, held=120 * 2**20), big, 0.1) == ["held"]
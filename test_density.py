@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+from density import DensityRaster
+
+
+# Chunks smaller and larger than the 1200 pixel raster, the two ways of
+# accumulating them.
+@pytest.mark.parametrize("chunk", [100, 3000])
+def test_density_matches_histogram2d(chunk):
+    rng = np.random.default_rng(0)
+    xpts, ypts = rng.normal(size=(2, 10000))
+    # Repeated points must all count.
+    xpts[:50], ypts[:50] = 0.13, 0.17
+    raster = DensityRaster(40, 30, (-2.0, 2.0, -1.5, 1.5))
+    starts = range(0, len(xpts), chunk)
+    raster.addChunks((xpts[k : k + chunk], ypts[k : k + chunk]) for k in starts)
+    hist, _, _ = np.histogram2d(
+        ypts, xpts, bins=(30, 40), range=((-1.5, 1.5), (-2.0, 2.0))
+    )
+    # Row 0 of the raster is the top of the view.
+    np.testing.assert_array_equal(raster.counts, hist[::-1])
+    assert raster.npts == hist.sum()
+
+
+def test_density_rgb_blends_color_over_background():
+    raster = DensityRaster(4, 4, (0.0, 4.0, 0.0, 4.0))
+    raster.add(np.array([0.5, 0.5, 3.5]), np.array([3.5, 3.5, 0.5]))
+    rgb = raster.rgb(color=(1, 0, 0), background=(1, 1, 1))
+    assert rgb.dtype == np.uint8 and rgb.shape == (4, 4, 3)
+    np.testing.assert_array_equal(rgb[0, 0], (255, 0, 0))
+    np.testing.assert_array_equal(rgb[0, 1], (255, 255, 255))
@@ -0,0 +1,56 @@
+import io
+import numpy as np
+from PIL import Image, ImageSequence
+from framesink import GifWriter, openSink
+
+
+def frames(count=3, width=24, height=16):
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 256, size=(count, height, width, 3), dtype=np.uint8)
+
+
+def quantized(frame):
+    return np.asarray(Image.fromarray(frame).quantize(256).convert("RGB"))
+
+
+def test_gif_frames_round_trip(tmp_path):
+    path = str(tmp_path / "out.gif")
+    images = frames()
+    with openSink([path], 24, 16, fps=25) as sink:
+        for frame in images:
+            sink.write(frame)
+    with Image.open(path) as gif:
+        assert gif.n_frames == len(images)
+        assert gif.info["duration"] == 40
+        for frame, read in zip(images, ImageSequence.Iterator(gif)):
+            np.testing.assert_array_equal(
+                np.asarray(read.convert("RGB")), quantized(frame)
+            )
+
+
+def test_image_block_keeps_local_color_table():
+    buf = io.BytesIO()
+    Image.fromarray(frames(1)[0]).quantize(256).save(buf, "GIF")
+    data = buf.getvalue()
+    flags = data[10]
+    assert flags & 0x80
+    size = 3 << ((flags & 0x07) + 1)
+    table = data[13 : 13 + size]
+    pos = 13 + size
+    while data[pos] == 0x21:
+        pos = GifWriter._skipSubBlocks(data, pos + 2)
+    # The same GIF with the global color table moved into the image.
+    descriptor = bytearray(data[pos : pos + 10])
+    descriptor[9] |= 0x80 | (flags & 0x07)
+    local = (
+        data[:10]
+        + bytes([flags & 0x70])
+        + data[11:13]
+        + data[13 + size : pos]
+        + bytes(descriptor)
+        + table
+        + data[pos + 10 :]
+    )
+    block = GifWriter._imageBlock(data)
+    assert GifWriter._imageBlock(local) == block
+    assert block[10 : 10 + size] == table
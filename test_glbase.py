@@ -0,0 +1,74 @@
+import csv
+import json
+import types
+import numpy as np
+import pytest
+
+pytest.importorskip("OpenGL")
+import glbase
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(
+        glbase, "time", types.SimpleNamespace(perf_counter=lambda: now[0])
+    )
+    return now
+
+
+def runFrames(profiler, clock, frames):
+    """Frames of (draw, frame) seconds, the rest of each frame outside phases."""
+    profiler.endFrame()
+    for draw, frame in frames:
+        with profiler.phase("draw"):
+            clock[0] += draw
+        clock[0] += frame - draw
+        profiler.endFrame()
+
+
+def test_frame_times_wrap_oldest_first(clock):
+    profiler = glbase.FrameProfiler(capacity=4)
+    frames = [(0.001 * k, 0.01 * k) for k in range(1, 7)]
+    runFrames(profiler, clock, frames)
+    times = profiler.frameTimes()
+    # Only the last four frames are kept, the oldest first.
+    assert times.shape == (4, len(profiler.phases) + 2)
+    np.testing.assert_allclose(times[:, -1], [0.03, 0.04, 0.05, 0.06])
+    draw = profiler.phases.index("draw")
+    np.testing.assert_allclose(times[:, draw], [0.003, 0.004, 0.005, 0.006])
+    np.testing.assert_allclose(times[:, -2], times[:, -1] - times[:, draw])
+
+
+def test_summary_counts_stutters(clock):
+    profiler = glbase.FrameProfiler(stutter=2.0)
+    frames = [(0.005, 0.01)] * 20 + [(0.005, 0.025), (0.005, 0.019), (0.005, 0.1)]
+    runFrames(profiler, clock, frames)
+    stats = profiler.summary()
+    assert stats["frames"] == 23
+    assert stats["stutters"] == 2
+    assert stats["frame"]["p50"] == pytest.approx(10.0)
+    assert stats["draw"]["mean"] == pytest.approx(5.0)
+    assert stats["frame"]["p99"] > stats["frame"]["p95"] > stats["frame"]["p50"]
+    assert glbase.FrameProfiler().summary() == {}
+
+
+@pytest.mark.parametrize("ext", [".json", ".csv"])
+def test_export_round_trips(clock, tmp_path, ext):
+    profiler = glbase.FrameProfiler(capacity=3)
+    runFrames(profiler, clock, [(0.002, 0.01), (0.004, 0.02), (0.001, 0.03), (0, 0.04)])
+    path = str(tmp_path / ("trace" + ext))
+    profiler.export(path)
+    columns = profiler.phases + ["other", "frame"]
+    if ext == ".json":
+        with open(path) as f:
+            data = json.load(f)
+        assert data["columns"] == columns
+        assert data["summary"]["frames"] == 3
+        seconds = data["seconds"]
+    else:
+        with open(path, newline="") as f:
+            rows = list(csv.reader(f))
+        assert rows[0] == columns
+        seconds = [[float(v) for v in row] for row in rows[1:]]
+    np.testing.assert_allclose(seconds, profiler.frameTimes())
@@ -0,0 +1,35 @@
+import numpy as np
+import ziafract
+from ifs import ZiaIFS
+from zia import Zia
+
+
+def ziaIFS(scale, rotation=0.0):
+    return ZiaIFS.fromZia(Zia(1.0, 2.0, 1, rayN=1, sunN=4), scale, rotation)
+
+
+def test_expand_is_first_fract_level():
+    # fract at this scale expands exactly one level.
+    scale = ziafract.SCALE_DEPTH / ziafract.SCALE_STEPDOWN
+    ifs = ziaIFS(scale)
+    xpts, ypts = ifs.expand(2)
+    fx, fy = ziafract.fract(ifs.t[:, 0], ifs.t[:, 1], scale)
+    np.testing.assert_allclose(np.sort(xpts), np.sort(fx))
+    np.testing.assert_allclose(np.sort(ypts), np.sort(fy))
+
+
+def test_chaos_points_lie_on_attractor():
+    ifs = ziaIFS(0.05, rotation=0.3)
+    xpts, ypts = next(ifs.chaos(walkers=200, seed=1))
+    # After burn in the walkers are on the attractor, so within scale**3
+    # times its radius of a depth 3 point.
+    ex, ey = ifs.expand(3)
+    attractor = ex + 1j * ey
+    dist = np.abs((xpts + 1j * ypts)[:, None] - attractor[None, :]).min(axis=1)
+    assert dist.max() < 2 * 0.05**3 * 3
+
+
+def test_sample_yields_npts():
+    ifs = ziaIFS(0.05)
+    chunks = list(ifs.sample(2500, walkers=1000, seed=2))
+    assert [len(x) for x, y in chunks] == [1000, 1000, 500]
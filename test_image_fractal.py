@@ -0,0 +1,186 @@
+import json
+import os
+import subprocess
+import sys
+import time
+import numpy as np
+import pytest
+
+pytest.importorskip("cv2")
+import image_fractal
+
+
+def test_julia_iim_traces_the_unit_circle():
+    # The Julia set of c = 0 is the unit circle.
+    density = image_fractal.julia_iim(0j, (64, 48), depth=14, zoom=0.7)
+    assert density.shape == (48, 64)
+    row, col = np.nonzero(density)
+    # The pixel centers generate_row would take, the height is padded to 64.
+    side = 63
+    x = (2 * col / side - 1) / 0.7
+    y = (2 * (48 - row + 8) / side - 1) / 0.7
+    radius = np.hypot(x, y)
+    assert np.all(np.abs(radius - 1) < 2 / (0.7 * side))
+    # Hits all around it, not piled up at the fixed point.
+    angles = np.arctan2(y, x)
+    assert len(np.unique(np.floor(angles / (np.pi / 8)))) == 16
+
+
+def test_julia_iim_caps_visits_per_cell():
+    capped = image_fractal.julia_iim(-1 + 0j, (64, 64), depth=40, max_hits=1)
+    more = image_fractal.julia_iim(-1 + 0j, (64, 64), depth=40, max_hits=8)
+    assert 0 < capped.sum() < more.sum()
+
+
+@pytest.mark.parametrize(
+    "model, c, zoom, center",
+    [
+        ("julia", -0.75472 - 0.06592j, 0.6, (0.0, 0.0)),
+        ("mandelbrot", None, 1.0, (-0.5, 0.0)),
+        ("mandelbrot", None, 40.0, (-0.7436, 0.1318)),
+    ],
+)
+def test_row_fields_counts_match_generate_row(model, c, zoom, center):
+    size, depth = (40, 30), 80
+    for row in range(0, size[1], 3):
+        counts, smooth, distance = image_fractal.generate_row_fields(
+            model, c, size, depth, zoom, center, row
+        )
+        expect = image_fractal.generate_row(model, c, size, depth, zoom, center, row)
+        np.testing.assert_array_equal(counts, expect)
+        inside = counts == depth
+        np.testing.assert_array_equal(distance[inside], 0)
+        assert np.all(distance[~inside] > 0)
+        # The smooth count stays within a band of the integer one.
+        assert np.all(np.abs(smooth - counts)[~inside] < 2)
+
+
+def tileArgs(checkpoint, size=(24, 20)):
+    return ("mandelbrot", None, size, 60, 1.0, (-0.5, 0.0), "counts", checkpoint)
+
+
+def directRows(size=(24, 20)):
+    return np.array(
+        [
+            image_fractal.generate_row(
+                "mandelbrot", None, size, 60, 1.0, (-0.5, 0.0), row
+            )
+            for row in range(size[1])
+        ]
+    )
+
+
+def readManifest(checkpoint):
+    with open(os.path.join(checkpoint, "manifest.json")) as f:
+        return json.load(f)
+
+
+def test_render_tiles_resumes(tmp_path):
+    checkpoint = str(tmp_path)
+    img = image_fractal.render_tiles(*tileArgs(checkpoint), 8, 2)
+    np.testing.assert_array_equal(img, directRows())
+    manifest = readManifest(checkpoint)
+    assert sorted(manifest["tiles"]) == ["0", "1", "2"]
+    assert all(t["status"] == "done" for t in manifest["tiles"].values())
+    assert not [name for name in os.listdir(checkpoint) if name.endswith(".lock")]
+
+    kept = os.path.getmtime(image_fractal._tile_path(checkpoint, 0, ".npy"))
+    os.remove(image_fractal._tile_path(checkpoint, 1, ".npy"))
+    img = image_fractal.render_tiles(*tileArgs(checkpoint), 8, 1)
+    np.testing.assert_array_equal(img, directRows())
+    assert os.path.getmtime(image_fractal._tile_path(checkpoint, 0, ".npy")) == kept
+
+
+def test_render_tiles_refuses_other_params(tmp_path):
+    checkpoint = str(tmp_path)
+    image_fractal.render_tiles(*tileArgs(checkpoint), 8, 1)
+    with pytest.raises(ValueError):
+        image_fractal.render_tiles(*tileArgs(checkpoint, (24, 21)), 8, 1)
+    with pytest.raises(ValueError):
+        image_fractal.render_tiles(*tileArgs(checkpoint), 4, 1)
+
+
+def writeLock(checkpoint, tile, age, host="elsewhere", pid=1):
+    lock = image_fractal._tile_path(checkpoint, tile, ".lock")
+    owner = {"host": host, "pid": pid, "started": 0.0, "token": "theirs"}
+    with open(lock, "w") as f:
+        json.dump(owner, f)
+    os.utime(lock, (time.time() - age, time.time() - age))
+    return lock
+
+
+def test_claim_tile_respects_live_locks(tmp_path):
+    checkpoint = str(tmp_path)
+    image_fractal._update_manifest(checkpoint, lambda m: {"params": {}, "tiles": {}})
+    # A long tile whose owner keeps its heartbeat is not taken over.
+    writeLock(checkpoint, 0, image_fractal.LOCK_HEARTBEAT)
+    assert image_fractal._claim_tile(checkpoint, 0) is None
+
+    lock = writeLock(checkpoint, 1, 2 * image_fractal.LOCK_STALE)
+    owner = image_fractal._claim_tile(checkpoint, 1)
+    assert owner is not None and owner["token"] != "theirs"
+    assert readManifest(checkpoint)["tiles"]["1"]["status"] == "abandoned"
+
+    # The old owner finishing must not remove the new owner's lock.
+    image_fractal._release_tile(lock, {"token": "theirs"})
+    assert os.path.exists(lock)
+    image_fractal._release_tile(lock, owner)
+    assert not os.path.exists(lock)
+    image_fractal._release_tile(lock, owner)
+
+
+def test_stale_locks_are_taken_over_once(tmp_path, capsys):
+    # A crashed run leaves locks of a dead process, and every worker of the
+    # resumed run goes for them in the same order.
+    dead = subprocess.Popen([sys.executable, "-c", ""])
+    dead.wait()
+    checkpoint = str(tmp_path)
+    size = (24, 64)
+    for tile in range(8):
+        writeLock(checkpoint, tile, 0, image_fractal.HOST, dead.pid)
+    img = image_fractal.render_tiles(*tileArgs(checkpoint, size), 8, 4)
+    np.testing.assert_array_equal(img, directRows(size))
+    assert "Rendered 8 tiles" in capsys.readouterr().out
+    manifest = readManifest(checkpoint)
+    assert all(t["status"] == "done" for t in manifest["tiles"].values())
+
+
+def test_heartbeat_refreshes_lock(tmp_path, monkeypatch):
+    monkeypatch.setattr(image_fractal, "LOCK_HEARTBEAT", 0.01)
+    checkpoint = str(tmp_path)
+    image_fractal._update_manifest(checkpoint, lambda m: {"params": {}, "tiles": {}})
+    owner = image_fractal._claim_tile(checkpoint, 0)
+    lock = image_fractal._tile_path(checkpoint, 0, ".lock")
+    os.utime(lock, (0, 0))
+    with image_fractal._heartbeat(lock, owner):
+        time.sleep(0.1)
+    assert time.time() - os.path.getmtime(lock) < 1
+
+
+def test_failed_tiles_are_recorded(tmp_path, monkeypatch):
+    checkpoint = str(tmp_path)
+
+    def broken(*args):
+        raise RuntimeError("out of memory")
+
+    monkeypatch.setattr(image_fractal, "shaded_row", broken)
+    image_fractal._update_manifest(checkpoint, lambda m: {"params": {}, "tiles": {}})
+    with pytest.raises(RuntimeError):
+        image_fractal.tile_worker(*tileArgs(checkpoint), 8)
+    record = readManifest(checkpoint)["tiles"]["0"]
+    assert record["status"] == "failed" and "out of memory" in record["error"]
+    assert not os.path.exists(image_fractal._tile_path(checkpoint, 0, ".lock"))
+
+
+def test_place_images_copies_the_field():
+    import matplotlib.pyplot as plt
+
+    here = os.path.dirname(os.path.abspath(image_fractal.__file__))
+    small = os.path.join(here, image_fractal.DEFAULT_SMALL_IMG)
+    large = os.path.join(here, image_fractal.DEFAULT_LARGE_IMG)
+    img = directRows((200, 200)).astype(np.float64)
+    before = img.copy()
+    out = image_fractal.place_images(img, (200, 200), small, large, output=None)
+    plt.close("all")
+    np.testing.assert_array_equal(img, before)
+    assert out is not img and out.shape == img.shape
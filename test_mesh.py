@@ -0,0 +1,44 @@
+import numpy as np
+from mesh import getCubeArray, getCubeArrays, getCubeColors, indexedCubes
+
+
+def test_cube_arrays_match_concatenated_cubes():
+    rng = np.random.default_rng(0)
+    centers = rng.uniform(-3.0, 3.0, size=(50, 3))
+    loop = np.concatenate([getCubeArray(*center, 0.05) for center in centers])
+    arr = getCubeArrays(centers, 0.05)
+    assert arr.dtype == np.float32 and arr.shape == loop.shape
+    np.testing.assert_allclose(arr, loop, atol=1e-6)
+    np.testing.assert_allclose(getCubeColors(arr), np.abs(loop), atol=1e-6)
+
+
+def test_cube_arrays_fill_out():
+    out = np.zeros(2 * 108, dtype=np.float32)
+    arr = getCubeArrays([[0.0, 0.0, 0.0], [1.0, 2.0, 3.0]], 0.5, out=out)
+    assert arr is out
+    np.testing.assert_allclose(out[108:111], [0.5, 1.5, 2.5])
+
+
+def test_indexed_cubes_cull_shared_faces():
+    # Two touching cubes and a duplicate of the first.
+    centers = [[0.0, 0.0, 0.0], [1.0, 0.0, 0.0], [0.0, 0.0, 0.0]]
+    vertices, colors, indices, stats = indexedCubes(centers, 0.5)
+    assert stats["unique cubes"] == 2
+    assert stats["triangles after"] == 2 * 10
+    assert len(vertices) == 12
+    np.testing.assert_array_equal(colors, np.abs(vertices))
+    # No kept triangle lies on the shared face x = 0.5.
+    tris = vertices[indices.reshape(-1, 3)]
+    assert not np.any(np.all(np.isclose(tris[:, :, 0], 0.5), axis=1))
+
+
+def test_indexed_cubes_cover_the_cube_mesh():
+    rng = np.random.default_rng(1)
+    centers = rng.uniform(-3.0, 3.0, size=(20, 3))
+    vertices, colors, indices, stats = indexedCubes(centers, 0.05)
+    # Apart cubes keep all faces, every corner of the flat mesh is present.
+    assert stats["triangles after"] == stats["triangles before"]
+    flat = getCubeArrays(centers, 0.05).reshape(-1, 3)
+    dist = np.abs(flat[:, None, :] - vertices[None, :, :]).max(axis=2).min(axis=1)
+    assert dist.max() < 1e-6
+    assert len(vertices) == 8 * len(centers)
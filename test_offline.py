@@ -0,0 +1,37 @@
+import os
+import numpy as np
+import pytest
+from offline import renderFrames
+
+
+def solidSetup(width, height):
+    def render(view):
+        return np.full((height, width, 3), int(view * 255), dtype=np.uint8)
+
+    return render
+
+
+def test_render_frames_resumes(tmp_path):
+    frameDir = str(tmp_path)
+    paths = renderFrames(solidSetup, (4, 3), [0.0, 0.5, 1.0], frameDir, procs=1)
+    assert all(os.path.exists(path) for path in paths)
+    os.remove(paths[1])
+    mtime = os.path.getmtime(paths[0])
+    assert renderFrames(solidSetup, (4, 3), [0.0, 0.5, 1.0], frameDir, 1) == paths
+    assert os.path.exists(paths[1])
+    assert os.path.getmtime(paths[0]) == mtime
+
+
+@pytest.mark.parametrize(
+    "args, views, params",
+    [
+        ((8, 3), [0.0, 0.5, 1.0], None),
+        ((4, 3), [0.0, 0.25, 1.0], None),
+        ((4, 3), [0.0, 0.5, 1.0], {"tone": "gamma"}),
+    ],
+)
+def test_render_frames_refuses_other_render(tmp_path, args, views, params):
+    frameDir = str(tmp_path)
+    renderFrames(solidSetup, (4, 3), [0.0, 0.5, 1.0], frameDir, procs=1)
+    with pytest.raises(ValueError):
+        renderFrames(solidSetup, args, views, frameDir, 1, params)
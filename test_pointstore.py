@@ -0,0 +1,54 @@
+import numpy as np
+from pointstore import PointStore, mortonCodes
+
+
+def randomStore(tmp_path, npts=20000, levels=4):
+    rng = np.random.default_rng(0)
+    xpts, ypts = rng.normal(size=(2, npts))
+    return xpts, ypts, PointStore.write(str(tmp_path), xpts, ypts, levels)
+
+
+def sortedPoints(xpts, ypts):
+    return np.sort(xpts + 1j * ypts)
+
+
+def test_store_is_in_z_order(tmp_path):
+    xpts, ypts, store = randomStore(tmp_path)
+    assert len(store) == len(xpts)
+    codes = mortonCodes(store.points[:, 0], store.points[:, 1], store.bounds, 4)
+    assert np.all(np.diff(codes.astype(np.int64)) >= 0)
+    np.testing.assert_array_equal(
+        sortedPoints(*store.points.T), sortedPoints(xpts, ypts)
+    )
+
+
+def test_query_matches_brute_force(tmp_path):
+    xpts, ypts, store = randomStore(tmp_path)
+    for view in [(-0.3, 1.1, -2.0, 0.2), (0.5, 0.6, 0.5, 0.6), (5.0, 6.0, 5.0, 6.0)]:
+        inside = (
+            (xpts >= view[0])
+            & (xpts <= view[1])
+            & (ypts >= view[2])
+            & (ypts <= view[3])
+        )
+        chunks = list(store.query(view))
+        qx = np.concatenate([x for x, y in chunks] + [[]])
+        qy = np.concatenate([y for x, y in chunks] + [[]])
+        np.testing.assert_array_equal(
+            sortedPoints(qx, qy), sortedPoints(xpts[inside], ypts[inside])
+        )
+        assert store.count(view) >= inside.sum()
+
+
+def test_query_ranges_are_merged_and_stepped(tmp_path):
+    xpts, ypts, store = randomStore(tmp_path)
+    assert store.ranges(store.bounds) == [[0, len(xpts)]]
+    chunks = list(store.query(store.bounds, clip=False, step=10))
+    assert sum(len(x) for x, y in chunks) == -(-len(xpts) // 10)
+
+
+def test_store_reopens(tmp_path):
+    xpts, ypts, store = randomStore(tmp_path)
+    again = PointStore(str(tmp_path))
+    assert again.bounds == store.bounds and again.levels == store.levels
+    np.testing.assert_array_equal(again.points, store.points)
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+import postproc
+
+
+def field(height=300, width=40):
+    rng = np.random.default_rng(0)
+    return rng.uniform(0.0, 4.0, size=(height, width))
+
+
+def test_run_strips_leaves_the_input_alone():
+    img = field()
+    before = img.copy()
+    out, vmax = postproc.runStrips(img, [postproc.sqrt(), postproc.gamma(2.0)], rows=64)
+    np.testing.assert_array_equal(img, before)
+    np.testing.assert_allclose(out, before)
+    assert vmax == out.max()
+
+
+def test_run_strips_inplace():
+    img = field()
+    before = img.copy()
+    out, vmax = postproc.runStrips(img, [postproc.sqrt()], rows=64, inplace=True)
+    assert out is img
+    np.testing.assert_allclose(img, np.sqrt(before))
+
+
+@pytest.mark.parametrize("inplace", [False, True])
+def test_run_strips_blur_matches_whole_image(inplace):
+    img = field()
+    expect = np.sqrt(cv2.blur(img, (5, 7)))
+    out, vmax = postproc.runStrips(
+        img, [postproc.sqrt()], blur=(5, 7), rows=32, inplace=inplace
+    )
+    np.testing.assert_allclose(out, expect)
+
+
+def test_threshold_and_mask():
+    img = field()
+    mask = np.random.default_rng(1).uniform(size=img.shape)
+    ops = [postproc.threshold(2.0), postproc.maskMultiply(mask)]
+    out, vmax = postproc.runStrips(img, ops, rows=50)
+    np.testing.assert_allclose(out, np.where(img <= 2.0, 0, img) * mask)
+
+
+def test_find_peaks():
+    img = np.zeros((600, 20))
+    img[[3, 299, 300, 599], [1, 2, 3, 19]] = [5.0, 6.0, 7.0, 8.0]
+    peaks, values = postproc.findPeaks(img, 5.5, rows=256)
+    np.testing.assert_array_equal(peaks, [[299, 2], [300, 3], [599, 19]])
+    np.testing.assert_array_equal(values, [6.0, 7.0, 8.0])
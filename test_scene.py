@@ -0,0 +1,77 @@
+import os
+import subprocess
+import sys
+import numpy as np
+import pytest
+
+pytest.importorskip("OpenGL")
+from scene import FAR, FOVY, NEAR, BVH, ZiaScene, frustumPlanes, perspective
+from scene import ziaHierarchy
+
+
+def lookAt(eye):
+    # Row major modelview translating the eye to the origin, looking down -z.
+    modelview = np.eye(4)
+    modelview[:3, 3] = -np.asarray(eye)
+    return modelview
+
+
+def bruteCull(centers, radii, planes):
+    dist = centers @ planes[:, :3].T + planes[:, 3]
+    return np.nonzero((dist >= -radii[:, None]).all(axis=1))[0]
+
+
+@pytest.mark.parametrize("eye", [(0.0, 0.0, 10.0), (4.0, -2.0, 3.0), (0, 0, -50.0)])
+def test_bvh_cull_matches_brute_force(eye):
+    rng = np.random.default_rng(0)
+    centers = rng.uniform(-10.0, 10.0, size=(5000, 3))
+    radii = rng.uniform(0.01, 0.5, size=5000)
+    bvh = BVH(centers, radii, leafSize=4)
+    planes = frustumPlanes(perspective(45.0, 1.5, 0.1, 50.0) @ lookAt(eye))
+    visible = bvh.cull(planes)
+    assert len(np.unique(visible)) == len(visible)
+    np.testing.assert_array_equal(np.sort(visible), bruteCull(centers, radii, planes))
+
+
+def test_bvh_nodes_bound_their_spheres():
+    rng = np.random.default_rng(1)
+    centers = rng.normal(size=(1000, 3))
+    radii = rng.uniform(0.0, 0.1, size=1000)
+    bvh = BVH(centers, radii)
+    for node in range(len(bvh)):
+        inds = bvh.spheres(node)
+        assert np.all(centers[inds] - radii[inds, None] >= bvh.lo[node] - 1e-12)
+        assert np.all(centers[inds] + radii[inds, None] <= bvh.hi[node] + 1e-12)
+
+
+def test_scene_select_splits_visible_instances():
+    xpts, ypts = np.array([1.0, -1.0, 0.0]), np.array([0.0, 0.0, 1.0])
+    centers, scales = ziaHierarchy(xpts, ypts, 3, 0.2, depth=0.5)
+    assert len(centers) == 1 + 3 + 9 + 27
+    scene = ZiaScene(centers, scales)
+    modelview = lookAt((0.0, 0.0, 8.0))
+    (full, coarse, points), stats = scene.select(modelview, 1.0, 600)
+    planes = frustumPlanes(perspective(FOVY, 1.0, NEAR, FAR) @ modelview)
+    visible = np.concatenate((full, coarse, points))
+    np.testing.assert_array_equal(np.sort(visible), np.sort(scene.bvh.cull(planes)))
+    assert stats["visible"] == len(visible) and len(full) >= 1
+
+
+def importPlatform(code):
+    env = dict(os.environ, GLBASE_BACKEND="egl")
+    env.pop("PYOPENGL_PLATFORM", None)
+    here = os.path.dirname(os.path.abspath(__file__))
+    return subprocess.run(
+        [sys.executable, "-c", code], env=env, cwd=here, capture_output=True, text=True
+    )
+
+
+def test_scene_picks_the_platform_before_opengl():
+    # bench loads scene before anything imports glbase.
+    run = importPlatform(
+        "import bench, OpenGL.platform as p; print(type(p.PLATFORM).__module__)"
+    )
+    assert run.returncode == 0, run.stderr
+    assert run.stdout.split() == ["OpenGL.platform.egl"]
+    run = importPlatform("import OpenGL.GL, scene")
+    assert run.returncode != 0 and "glplatform imported first" in run.stderr
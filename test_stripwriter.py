@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+from PIL import Image
+from matplotlib import pyplot as plt
+from stripwriter import colormapLUT, encodeStrips
+
+
+def field(height=70, width=50):
+    y, x = np.mgrid[0:height, 0:width]
+    return np.sin(x / 7.0) * np.cos(y / 5.0) + x / 40.0
+
+
+@pytest.mark.parametrize("ext", [".png", ".tif"])
+def test_8_bit_output_matches_imsave(tmp_path, ext):
+    img = field()
+    reference = str(tmp_path / "reference.png")
+    plt.imsave(reference, img, cmap="viridis")
+    output = str(tmp_path / ("strips" + ext))
+    encodeStrips(img, [(output, "viridis")], rows=16)
+    with Image.open(reference) as expect, Image.open(output) as image:
+        np.testing.assert_array_equal(
+            np.asarray(image.convert("RGB")), np.asarray(expect.convert("RGB"))
+        )
+
+
+def test_outputs_share_the_strips(tmp_path):
+    img = field()
+    outputs = [(str(tmp_path / "a.png"), "gray"), (str(tmp_path / "b.png"), "hot")]
+    encodeStrips(img, outputs, rows=32)
+    for path, cmap in outputs:
+        reference = str(tmp_path / "reference.png")
+        plt.imsave(reference, img, cmap=cmap)
+        with Image.open(reference) as expect, Image.open(path) as image:
+            np.testing.assert_array_equal(
+                np.asarray(image.convert("RGB")), np.asarray(expect.convert("RGB"))
+            )
+
+
+@pytest.mark.parametrize("cmap", ["gray", "viridis", "coolwarm"])
+def test_16_bit_lut_is_finer_than_8_bit(cmap):
+    lut = colormapLUT(cmap, 16)
+    assert lut.shape == (65536, 3) and lut.dtype == np.uint16
+    assert len(np.unique(lut, axis=0)) > 256
+    # It still runs through the same colors as the 8 bit table.
+    coarse = colormapLUT(cmap, 8).astype(np.float64) / 255
+    np.testing.assert_allclose(lut[::257] / 65535.0, coarse, atol=2.5 / 255)
+
+
+def test_16_bit_raw_output(tmp_path):
+    img = field()
+    output = str(tmp_path / "out.raw")
+    encodeStrips(img, [(output, "gray")], bits=16, rows=8)
+    data = np.fromfile(output, dtype="<u2").reshape(img.shape + (3,))
+    assert data[..., 0].min() == 0 and data[..., 0].max() == 65535
+    # Gray is monotonic, so the samples order the pixels like the field.
+    order = np.argsort(img, axis=None, kind="stable")
+    assert np.all(np.diff(data[..., 0].ravel()[order].astype(np.int64)) >= 0)
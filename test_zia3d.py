@@ -0,0 +1,71 @@
+import os
+import subprocess
+import sys
+import numpy as np
+import pytest
+
+pytest.importorskip("OpenGL")
+Image = pytest.importorskip("PIL.Image")
+
+FRAMES = 3
+SIZE = (160, 120)
+# The scene mode draws a single instance at full detail, which is the Zia
+# every other mode draws.
+SCENE_SETUP = """
+import functools, scene
+scene.LOD_PIXELS = (0.0, 0.0)
+scene.ZiaScene.hierarchy = functools.partial(
+    scene.ZiaScene.hierarchy.__func__, scene.ZiaScene, levels=0
+)
+"""
+
+
+def renderOffscreen(output, mode, setup=""):
+    """Frames of a Zia3D run on the surfaceless EGL backend, in a new process."""
+    code = setup + (
+        "import zia3d\n"
+        "zia3d.Zia3D('test', %d, %d, mode=%r).run(frames=%d, outputs=[%r])\n"
+        % (SIZE + (mode, FRAMES, output + os.sep))
+    )
+    env = dict(os.environ, GLBASE_BACKEND="egl")
+    env.pop("PYOPENGL_PLATFORM", None)
+    here = os.path.dirname(os.path.abspath(__file__))
+    run = subprocess.run(
+        [sys.executable, "-c", code], env=env, cwd=here, capture_output=True, text=True
+    )
+    if run.returncode:
+        return run, None
+    names = sorted(os.listdir(output))
+    frames = [np.asarray(Image.open(os.path.join(output, n)), np.int16) for n in names]
+    return run, frames
+
+
+@pytest.fixture(scope="module")
+def reference(tmp_path_factory):
+    run, frames = renderOffscreen(str(tmp_path_factory.mktemp("arrays")), "arrays")
+    if run.returncode:
+        pytest.skip("No offscreen EGL context: " + run.stderr.strip()[-200:])
+    return frames
+
+
+def test_offscreen_frames_are_read_back(reference):
+    # Every frame comes out of the pixel buffers once, in order, drawn.
+    assert len(reference) == FRAMES
+    for frame in reference:
+        assert frame.shape == (SIZE[1], SIZE[0], 3)
+        assert 0.01 < (frame.sum(axis=2) > 0).mean() < 0.5
+    assert not np.array_equal(reference[0], reference[-1])
+
+
+@pytest.mark.parametrize(
+    "mode, setup",
+    [("vbo", ""), ("instanced", ""), ("indexed", ""), ("scene", SCENE_SETUP)],
+)
+def test_draw_modes_match_arrays(reference, tmp_path, mode, setup):
+    run, frames = renderOffscreen(str(tmp_path), mode, setup)
+    assert run.returncode == 0, run.stderr
+    assert len(frames) == len(reference)
+    for frame, expect in zip(frames, reference):
+        # Shaders may round the interpolated colors a little differently.
+        diff = np.abs(frame - expect).max(axis=2)
+        assert (diff > 8).mean() < 1e-3
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+import ziafract
+from zia import Zia
+
+
+def ziaPoints():
+    return Zia(1.0, 2.0, 1, rayN=1, sunN=4).genZia()
+
+
+def loopFract(xpts, ypts, scale):
+    # The original recursive expansion fract replaced.
+    if scale <= ziafract.SCALE_DEPTH:
+        return xpts, ypts
+    newxpts = np.array([xpts * scale + x for x in xpts]).flatten()
+    newypts = np.array([ypts * scale + y for y in ypts]).flatten()
+    return loopFract(newxpts, newypts, ziafract.SCALE_STEPDOWN * scale)
+
+
+def test_fract_matches_loop():
+    xpts, ypts = ziaPoints()
+    fx, fy = ziafract.fract(xpts, ypts, ziafract.INIT_SCALE)
+    lx, ly = loopFract(xpts, ypts, ziafract.INIT_SCALE)
+    assert len(fx) == ziafract.fractSize(len(xpts), ziafract.INIT_SCALE)[0]
+    np.testing.assert_allclose(fx, lx)
+    np.testing.assert_allclose(fy, ly)
+
+
+def test_fract_budget():
+    xpts, ypts = ziaPoints()
+    with pytest.raises(MemoryError):
+        ziafract.fract(xpts, ypts, ziafract.INIT_SCALE, budget=1024)
+
+
+def test_fract_sample_points_are_in_set():
+    xpts, ypts = ziaPoints()
+    fx, fy = ziafract.fract(xpts, ypts, ziafract.INIT_SCALE)
+    sx, sy = ziafract.fractSample(xpts, ypts, ziafract.INIT_SCALE, 500)
+    assert len(sx) == 500
+    full = set(zip(np.round(fx, 9), np.round(fy, 9)))
+    assert set(zip(np.round(sx, 9), np.round(sy, 9))) <= full
+
+
+def test_fract_view_matches_culled_fract():
+    xpts, ypts = ziaPoints()
+    fx, fy = ziafract.fract(xpts, ypts, ziafract.INIT_SCALE)
+    view = (-0.5, 1.2, 0.3, 2.5)
+    # A pixel below the smallest copy fract makes but above the next level,
+    # so fractView neither truncates nor descends further than fract.
+    inside = (fx >= view[0]) & (fx <= view[1]) & (fy >= view[2]) & (fy <= view[3])
+    chunks = list(ziafract.fractView(xpts, ypts, ziafract.INIT_SCALE, view, 2e-5, 1000))
+    assert all(len(x) <= 1000 for x, y in chunks)
+    vx = np.concatenate([x for x, y in chunks])
+    vy = np.concatenate([y for x, y in chunks])
+    expect = np.sort(np.round(fx[inside] + 1j * fy[inside], 9))
+    np.testing.assert_allclose(np.sort(np.round(vx + 1j * vy, 9)), expect)
+
+
+def test_camera_path_matches_get_shift():
+    # The per-frame recursion cameraPath replaced.
+    def getShift(scale, shift):
+        if scale <= ziafract.SCALE_DEPTH:
+            return shift
+        return getShift(ziafract.SCALE_STEPDOWN * scale, shift + scale * shift)
+
+    frames = 10
+    path = ziafract.cameraPath(frames)
+    assert path.shape == (frames, 4)
+    for i in range(frames):
+        dpf = 1.0 / frames
+        shift = getShift(ziafract.INIT_SCALE, i * dpf * np.cos(np.pi / 4))
+        st, en = -3.0 * dpf * (frames - i) + shift, 3.0 * dpf * (frames - i) + shift
+        np.testing.assert_allclose(path[i], (st, en, st, en))
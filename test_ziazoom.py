@@ -0,0 +1,44 @@
+import numpy as np
+from matplotlib.colors import to_rgba
+from matplotlib.figure import Figure
+import ziazoom
+from ziazoom import COLORS, LAYER_RATIO, LOOP_FRAMES, NUM_LAYERS, frameDepth
+
+
+def test_zoom_loops_exactly():
+    render = ziazoom.sceneSetup((2.0, 2.0), 40)
+    first = render(frameDepth(30))
+    np.testing.assert_array_equal(first, render(frameDepth(30 + LOOP_FRAMES)))
+    assert not np.array_equal(first, render(frameDepth(31)))
+
+
+def layers(zoom):
+    """(scale, color) of every scatter layer, largest first."""
+    # The largest coordinate of the Zia is at a point away from the origin.
+    k = np.argmax(np.abs(zoom.base[:, 0]))
+    return [
+        (scat.get_offsets()[k, 0] / zoom.base[k, 0], tuple(scat.get_facecolor()[0]))
+        for scat in zoom.scats
+    ]
+
+
+def test_update_recycles_layers_across_a_step():
+    ax = Figure().subplots()
+    zoom = ziazoom.ZiaZoom(ax, npts=200)
+    # The first drawn layer changes from j = 1 to j = 2 at depth 2.5.
+    before, after = 2.5 - 1e-9, 2.5
+    zoom.update(before)
+    old = layers(zoom)
+    scats = list(zoom.scats)
+    zoom.update(after)
+    new = layers(zoom)
+    assert zoom.scats == scats and len(new) == NUM_LAYERS
+    assert list(ax.collections) == scats
+    for k, (scale, color) in enumerate(new):
+        j = 2 + k
+        np.testing.assert_allclose(scale, LAYER_RATIO ** (j - after))
+        np.testing.assert_allclose(color, to_rgba(COLORS[j % len(COLORS)]))
+    # The layers drawn in both frames just move up a slot, unchanged.
+    for (scale, color), (prev, prevColor) in zip(new, old[1:]):
+        np.testing.assert_allclose(scale, prev, rtol=1e-6)
+        assert color == prevColor
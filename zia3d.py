@@ -3,7 +3,22 @@
 # @author: Theodore John McCormack
 
 from zia import Zia
-from glbase import GLBase, CUBE, drawCube, getCubeArray
+
+# glbase goes before OpenGL, it picks the PyOpenGL platform
+from glbase import (
+    GLBase,
+    CUBE,
+    drawCube,
+    getCubeArrays,
+    getCubeColors,
+    createBuffer,
+    compileProgram,
+    hasInstancing,
+    drawArrayBuffer,
+    drawElementBuffer,
+)
+from mesh import CUBE_VERTS, indexedCubes
+from scene import ZiaScene
 from OpenGL.GL import *
 from OpenGL.GLUT import *
 from OpenGL.GLU import *
@@ -13,11 +28,40 @@ import time
 
 random.seed()
 
+# "instanced" draws one cube mesh per Zia point from an offsets buffer with
+# a shader, "indexed" draws the merged mesh without hidden faces, "vbo" draws
+# the full mesh from buffer objects and "arrays" sends the NumPy arrays every
+# frame. Falls back to "vbo" without instancing. "scene" draws a two level
+# hierarchy of Zias with culling and levels of detail, see scene.ZiaScene.
+RENDER_MODE = "instanced"
+
+INSTANCE_VERTEX_SHADER = """
+#version 120
+attribute vec3 vertex;
+attribute vec3 offset;
+uniform float size;
+varying vec3 color;
+void main() {
+    vec3 position = offset + size * vertex;
+    color = abs(position);
+    gl_Position = gl_ModelViewProjectionMatrix * vec4(position, 1.0);
+}
+"""
+
+INSTANCE_FRAGMENT_SHADER = """
+#version 120
+varying vec3 color;
+void main() {
+    gl_FragColor = vec4(color, 1.0);
+}
+"""
+
 
 class Zia3D(GLBase):
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, mode=RENDER_MODE, npts=2000, **kwargs):
         super().__init__(*args, **kwargs)
-        self.zia = Zia(1, 2, 1, npts=2000)
+        self.mode = mode
+        self.zia = Zia(1, 2, 1, npts=npts)
         xpts, ypts = self.zia.genZia()
         zpts = np.zeros(xpts.shape)
         self.xpts = xpts
@@ -36,43 +80,88 @@ class Zia3D(GLBase):
         self.N_differential = 5
 
         # Make the zia matrix
-        self.arr = np.array([])
-        for xpt, ypt, zpt in zip(self.xpts, self.ypts, self.zpts):
-            if self.arr.size:
-                self.arr = np.concatenate(
-                    (self.arr, getCubeArray(xpt, ypt, zpt, self.size))
-                )
-            else:
-                self.arr = getCubeArray(xpt, ypt, zpt, self.size)
-
-        self.col = np.abs(self.arr.copy())
+        centers = np.column_stack((self.xpts, self.ypts, self.zpts))
+        self.arr = getCubeArrays(centers, self.size)
+        self.col = getCubeColors(self.arr)
 
         print(self.arr.shape)
         print(self.arr.ravel())
 
+    def initGL(self):
+        super().initGL()
+        self.initBuffers()
+
+    def initBuffers(self):
+        # Everything is uploaded once here, drawing only binds the buffers
+        if self.mode == "instanced" and not hasInstancing():
+            print("Instanced drawing is not supported, using vertex buffers.")
+            self.mode = "vbo"
+        self.cubeBuf = createBuffer(CUBE_VERTS)
+        if self.mode == "instanced":
+            offsets = np.column_stack((self.xpts, self.ypts, self.zpts))
+            self.offsetBuf = createBuffer(offsets.astype(np.float32))
+            self.program = compileProgram(
+                INSTANCE_VERTEX_SHADER, INSTANCE_FRAGMENT_SHADER
+            )
+            self.vertexLoc = glGetAttribLocation(self.program, "vertex")
+            self.offsetLoc = glGetAttribLocation(self.program, "offset")
+            self.sizeLoc = glGetUniformLocation(self.program, "size")
+        elif self.mode == "indexed":
+            centers = np.column_stack((self.xpts, self.ypts, self.zpts))
+            vertices, colors, indices, stats = indexedCubes(centers, self.size)
+            print(
+                "Indexed mesh: %d -> %d triangles, %.2f -> %.2f MB"
+                % (
+                    stats["triangles before"],
+                    stats["triangles after"],
+                    stats["bytes before"] / 2.0**20,
+                    stats["bytes after"] / 2.0**20,
+                )
+            )
+            self.arrBuf = createBuffer(vertices)
+            self.colBuf = createBuffer(colors)
+            self.indexBuf = createBuffer(indices, GL_ELEMENT_ARRAY_BUFFER)
+            self.indexCount = len(indices)
+        elif self.mode == "vbo":
+            self.arrBuf = createBuffer(self.arr)
+            self.colBuf = createBuffer(self.col)
+        elif self.mode == "scene":
+            self.scene = ZiaScene.hierarchy(zia=self.zia, size=self.size)
+            self.scene.initGL()
+
+    def drawOriginCube(self):
+        glColor3f(1, 1, 1)
+        if self.mode == "arrays":
+            drawCube(0, 0, 0, self.size)
+            return
+        glPushMatrix()
+        glScalef(self.size, self.size, self.size)
+        drawArrayBuffer(self.cubeBuf, len(CUBE_VERTS))
+        glPopMatrix()
+
     def drawGLScene(self):
-        self.time += 0.01
-        self.center = np.array(
-            [0.0, 0.5, -10]
-        ) + self.center * np.sin(self.time)
+        with self.profiler.phase("update"):
+            self.time += 0.01
+            self.center = np.array([0.0, 0.5, -10]) + self.center * np.sin(self.time)
 
         # Clear The Screen And The Depth Buffer
-        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
-        glLoadIdentity()  # Reset The View
+        with self.profiler.phase("draw"):
+            glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+            glLoadIdentity()  # Reset The View
 
-        # Draw center of origin cube
-        glTranslatef(*self.center)
-        glColor3f(1, 1, 1)
-        drawCube(0, 0, 0, self.size)
+            # Draw center of origin cube
+            glTranslatef(*self.center)
+            self.drawOriginCube()
 
         self.drawZiaZoom()
 
         # self.drawZiaTest()
 
         #  since this is double buffered, swap the buffers to display what just got drawn.
-        glutSwapBuffers()
+        self.swapBuffers()
 
-        self.__updateRotate()
+        with self.profiler.phase("update"):
+            self.__updateRotate()
 
         self.framerate()
 
@@ -90,15 +179,53 @@ class Zia3D(GLBase):
         # print(self.rotate)
 
     def drawZiaZoom(self):
+        # glTranslatef(0, 0, -(10 * np.sin(self.time)+5))
+        glRotatef(*self.rotate)
+        if self.mode == "instanced":
+            self.drawZiaInstanced()
+        elif self.mode == "indexed":
+            with self.profiler.phase("draw"):
+                drawElementBuffer(
+                    self.arrBuf, self.indexBuf, self.indexCount, self.colBuf
+                )
+        elif self.mode == "vbo":
+            with self.profiler.phase("draw"):
+                drawArrayBuffer(self.arrBuf, len(self.arr) // 3, self.colBuf)
+        elif self.mode == "scene":
+            with self.profiler.phase("draw"):
+                self.sceneStats = self.scene.draw(self.width / self.height, self.height)
+        else:
+            self.drawZiaArrays()
+
+    def drawZiaInstanced(self):
+        # One cube mesh, drawn once per Zia point at its offset by the shader
+        with self.profiler.phase("upload"):
+            glUseProgram(self.program)
+            glUniform1f(self.sizeLoc, self.size)
+            glEnableVertexAttribArray(self.vertexLoc)
+            glBindBuffer(GL_ARRAY_BUFFER, self.cubeBuf)
+            glVertexAttribPointer(self.vertexLoc, 3, GL_FLOAT, GL_FALSE, 0, None)
+            glEnableVertexAttribArray(self.offsetLoc)
+            glBindBuffer(GL_ARRAY_BUFFER, self.offsetBuf)
+            glVertexAttribPointer(self.offsetLoc, 3, GL_FLOAT, GL_FALSE, 0, None)
+            glVertexAttribDivisor(self.offsetLoc, 1)
+        with self.profiler.phase("draw"):
+            glDrawArraysInstanced(GL_TRIANGLES, 0, len(CUBE_VERTS), len(self.xpts))
+        glVertexAttribDivisor(self.offsetLoc, 0)
+        glDisableVertexAttribArray(self.offsetLoc)
+        glDisableVertexAttribArray(self.vertexLoc)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        glUseProgram(0)
+
+    def drawZiaArrays(self):
         # Draw the zia using draw arrays (executes on Graphics card this way since only one cpu call sends the whole zia)
         glEnableClientState(GL_COLOR_ARRAY)
         glEnableClientState(GL_VERTEX_ARRAY)
-
-        # glTranslatef(0, 0, -(10 * np.sin(self.time)+5))
-        glRotatef(*self.rotate)
-        glColorPointer(3, GL_FLOAT, 0, self.col)
-        glVertexPointer(3, GL_FLOAT, 0, self.arr)
-        glDrawArrays(GL_TRIANGLES, 0, int(self.arr.shape[0] / 3))
+        with self.profiler.phase("upload"):
+            glColorPointer(3, GL_FLOAT, 0, self.col)
+            glVertexPointer(3, GL_FLOAT, 0, self.arr)
+        with self.profiler.phase("draw"):
+            glDrawArrays(GL_TRIANGLES, 0, int(self.arr.shape[0] / 3))
         glDisableClientState(GL_COLOR_ARRAY)
         glDisableClientState(GL_VERTEX_ARRAY)
 
@@ -2,65 +2,393 @@
 # License is MIT, see COPYING.txt for more details.
 # @author: Theodore John McCormack
 
+import os
 import matplotlib
 import matplotlib.pyplot as plt
 import matplotlib.animation as animation
 import numpy as np
 from zia import Zia
+from density import DensityRaster
+from offline import renderOffline
+from pointstore import PointStore
 
 NUM_DEPTH = 2
 SCALE_STEPDOWN = 0.01
 INIT_SCALE = 0.05
 SCALE_DEPTH = INIT_SCALE * np.power(SCALE_STEPDOWN, NUM_DEPTH)
 MAX_PLT_PTS = 100000
+FRACT_MEM_BUDGET = 2**30  # bytes
+FRACT_CHUNK = 65536
+LAZY_VIEW = True
+DENSITY = False
+DENSITY_TONE = "log"
+OFFLINE = False
+OFFLINE_SIZE = (640, 640)
+FRAME_DIR = "frames/ziafract"
+OUTPUTS = ("infzia2.mp4", "infzia2.gif")
+STORE_PATH = None
 FRAMES = 100
 
 
-def fract(xpts, ypts, scale):
+def fractLevels(scale):
+    """Scales at which fract expands the point set, from scale down to SCALE_DEPTH."""
+    scales = list()
+    while scale > SCALE_DEPTH:
+        scales.append(scale)
+        scale = SCALE_STEPDOWN * scale
+    return scales
+
+
+def fractSize(npts, scale):
+    """Number of points and bytes (x and y, float64) fract will return."""
+    final = npts
+    for _ in fractLevels(scale):
+        final = final * final
+    return final, 2 * final * np.dtype(np.float64).itemsize
+
+
+def fract(xpts, ypts, scale, budget=FRACT_MEM_BUDGET):
+    """
+    Expands the point set by placing a copy scaled by scale at every point,
+    once per level down to SCALE_DEPTH. Each level squares the number of
+    points, so the result size is known up front: the last level is written
+    straight into arrays of the final size with broadcast outer sums, and a
+    MemoryError is raised if those arrays would exceed budget bytes.
+    """
+    xpts, ypts = np.asarray(xpts, dtype=np.float64), np.asarray(ypts, dtype=np.float64)
+    scales = fractLevels(scale)
+    npts, nbytes = fractSize(len(xpts), scale)
     print(
-        "Calculating for scale = %f, depth = %f, npts = %d..."
-        % (scale, SCALE_DEPTH, len(xpts))
+        "Calculating for scale = %f, depth = %f, levels = %d, npts = %d..."
+        % (scale, SCALE_DEPTH, len(scales), npts)
     )
-    if scale <= SCALE_DEPTH:
-        print("Reached max depth.")
+    if budget and nbytes > budget:
+        raise MemoryError(
+            "fract needs %d points (%.1f MB), over the budget of %.1f MB"
+            % (npts, nbytes / 2.0**20, budget / 2.0**20)
+        )
+    if not scales:
         return xpts, ypts
-    newxpts, newypts = list(), list()
-    for xpt, ypt in zip(xpts, ypts):
-        xpts1, ypts1 = (xpts * scale + xpt), (ypts * scale + ypt)
-        newxpts.append(xpts1)
-        newypts.append(ypts1)
-    return fract(
-        np.array(newxpts).flatten(), np.array(newypts).flatten(), SCALE_STEPDOWN * scale
-    )
 
+    # Intermediate levels are at most sqrt of the final size, so they are
+    # cheap; only the final level is big and it gets no temporaries.
+    for s in scales[:-1]:
+        xpts = np.add.outer(xpts, s * xpts).ravel()
+        ypts = np.add.outer(ypts, s * ypts).ravel()
 
-def animate(i, ax):
-    print(f"Frame {i} of {FRAMES}")
-    POSX, POSY = np.cos(np.pi / 4), np.sin(np.pi / 4)
-    dpf = 1.0 / FRAMES
-    st = -3.0 * dpf * (FRAMES - i)
-    en = 3.0 * dpf * (FRAMES - i)
+    s = scales[-1]
+    n = len(xpts)
+    newxpts, newypts = np.empty(n * n), np.empty(n * n)
+    np.add(xpts[:, None], s * xpts[None, :], out=newxpts.reshape(n, n))
+    np.add(ypts[:, None], s * ypts[None, :], out=newypts.reshape(n, n))
+    print("Reached max depth.")
+    return newxpts, newypts
+
+
+def fractSample(xpts, ypts, scale, size, replace=False):
+    """
+    Draws size points uniformly from the set fract would return without
+    building it. A flat index f at a level splits into the point f // n and
+    the scaled copy point f % n of the level below, so only the sampled
+    indices are ever resolved.
+    """
+    xpts, ypts = np.asarray(xpts, dtype=np.float64), np.asarray(ypts, dtype=np.float64)
+    scales = fractLevels(scale)
+    sizes = [len(xpts)]
+    for _ in scales:
+        sizes.append(sizes[-1] * sizes[-1])
+    total = sizes[-1]
+    if not replace and size >= total:
+        return fract(xpts, ypts, scale, budget=None)
+    rng = np.random.default_rng()
+    if total < 2**63:
+        inds = rng.choice(total, size=size, replace=replace)
+    else:
+        # np.random.choice cannot draw from more than int64 values, and
+        # duplicates are vanishingly unlikely at these sizes anyway.
+        inds = None
+
+    def resolve(level, inds, count):
+        if level == 0:
+            if inds is None:
+                inds = rng.integers(0, sizes[0], size=count)
+            return xpts[inds], ypts[inds]
+        n = sizes[level - 1]
+        if inds is None or n >= 2**63:
+            anchors, copies = None, None
+        else:
+            anchors, copies = np.divmod(inds, n)
+        ax, ay = resolve(level - 1, anchors, count)
+        cx, cy = resolve(level - 1, copies, count)
+        s = scales[level - 1]
+        return ax + s * cx, ay + s * cy
+
+    return resolve(len(scales), inds, size)
+
+
+def _bbox(xpts, ypts):
+    return np.array([np.min(xpts), np.max(xpts), np.min(ypts), np.max(ypts)])
+
+
+def fractView(xpts, ypts, scale, view, pixel, chunk=FRACT_CHUNK):
+    """
+    Lazily yields (x, y) chunks of at most chunk points of the fractal that
+    fall inside view = (xmin, xmax, ymin, ymax).
+
+    The level k set is the union of copies p + s * S(k - 1) over the anchors
+    p in S(k - 1), so the hierarchy is only descended into copies whose
+    bounding box meets the view, and copies smaller than pixel are drawn as
+    their anchor point. The number of levels follows from pixel instead of
+    SCALE_DEPTH, which keeps the work per frame roughly constant however
+    deep the view is.
+    """
+    xpts, ypts = np.asarray(xpts, dtype=np.float64), np.asarray(ypts, dtype=np.float64)
+    scales, boxes = list(), [_bbox(xpts, ypts)]
+
+    def box(k):
+        # The scales are unbounded, extend the tables up to level k on demand.
+        while len(boxes) <= k:
+            s = scale * np.power(SCALE_STEPDOWN, len(scales))
+            scales.append(s)
+            boxes.append(boxes[-1] + s * boxes[-1])
+        return boxes[k]
+
+    def copySize(k):
+        # Extent of the copies that make up level k + 1.
+        box(k + 1)
+        b = boxes[k]
+        return scales[k] * max(b[1] - b[0], b[3] - b[2])
+
+    top = 0
+    while copySize(top) >= pixel:
+        top += 1
+
+    counts, full = dict(), dict()
+
+    def count(k, pix):
+        # Number of points of the whole level k set truncated at pix.
+        if (k, pix) not in counts:
+            if k == 0:
+                counts[k, pix] = len(xpts)
+            elif copySize(k - 1) < pix:
+                counts[k, pix] = count(k - 1, pix)
+            else:
+                s = scales[k - 1]
+                counts[k, pix] = count(k - 1, pix) * count(k - 1, pix / s)
+        return counts[k, pix]
+
+    def whole(k, pix):
+        # The whole truncated level k set, cached when it fits in a chunk.
+        if (k, pix) not in full:
+            if count(k, pix) > chunk:
+                full[k, pix] = None
+            else:
+                parts = list(gen(k, box(k), pix))
+                full[k, pix] = (
+                    np.concatenate([x for x, y in parts]),
+                    np.concatenate([y for x, y in parts]),
+                )
+        return full[k, pix]
+
+    def gen(k, view, pix):
+        # Points of the level k set inside view, in the coordinates of that set.
+        if k == 0:
+            inside = (
+                (xpts >= view[0])
+                & (xpts <= view[1])
+                & (ypts >= view[2])
+                & (ypts <= view[3])
+            )
+            if inside.any():
+                yield xpts[inside], ypts[inside]
+            return
+        if copySize(k - 1) < pix:
+            yield from gen(k - 1, view, pix)
+            return
+
+        s, b = scales[k - 1], box(k - 1)
+        anchorView = (
+            view[0] - s * b[1],
+            view[1] - s * b[0],
+            view[2] - s * b[3],
+            view[3] - s * b[2],
+        )
+        for ax, ay in gen(k - 1, anchorView, pix):
+            inside = (
+                (ax + s * b[0] >= view[0])
+                & (ax + s * b[1] <= view[1])
+                & (ay + s * b[2] >= view[2])
+                & (ay + s * b[3] <= view[3])
+            )
+            copy = whole(k - 1, pix / s) if inside.any() else None
+            if copy is not None:
+                cx, cy = copy
+                step = max(1, chunk // len(cx))
+                px, py = ax[inside], ay[inside]
+                for i in range(0, len(px), step):
+                    yield (
+                        np.add.outer(px[i : i + step], s * cx).ravel(),
+                        np.add.outer(py[i : i + step], s * cy).ravel(),
+                    )
+                ax, ay = ax[~inside], ay[~inside]
+            for px, py in zip(ax, ay):
+                sub = (
+                    (view[0] - px) / s,
+                    (view[1] - px) / s,
+                    (view[2] - py) / s,
+                    (view[3] - py) / s,
+                )
+                for cx, cy in gen(k - 1, sub, pix / s):
+                    yield px + s * cx, py + s * cy
+
+    bufx, bufy, size = list(), list(), 0
+    for x, y in gen(top, tuple(view), pixel):
+        bufx.append(x)
+        bufy.append(y)
+        size += len(x)
+        while size >= chunk:
+            x, y = np.concatenate(bufx), np.concatenate(bufy)
+            yield x[:chunk], y[:chunk]
+            bufx, bufy, size = [x[chunk:]], [y[chunk:]], size - chunk
+    if size:
+        yield np.concatenate(bufx), np.concatenate(bufy)
+
+
+def collectPoints(chunks, maxpts=MAX_PLT_PTS):
+    """Concatenates (x, y) chunks, stopping after maxpts points."""
+    xs, ys, size = list(), list(), 0
+    for x, y in chunks:
+        xs.append(x)
+        ys.append(y)
+        size += len(x)
+        if maxpts and size >= maxpts:
+            break
+    if not xs:
+        return np.array([]), np.array([])
+    return np.concatenate(xs)[:maxpts], np.concatenate(ys)[:maxpts]
 
-    def getShift(scale, shift):
-        if scale <= SCALE_DEPTH:
-            return shift
-        return getShift(SCALE_STEPDOWN * scale, shift + scale * shift)
 
-    shift = getShift(INIT_SCALE, i * dpf * POSX)
+def fractStore(xpts, ypts, path):
+    """Opens the fract point store at path, computing and writing it if missing."""
+    if os.path.exists(os.path.join(path, "index.npz")):
+        store = PointStore(path)
+        print("Loaded %d fractal points from %s." % (len(store), path))
+        return store
+    xpts, ypts = fract(xpts, ypts, INIT_SCALE)
+    return PointStore.write(path, xpts, ypts)
+
+
+def shiftGain(scale=INIT_SCALE):
+    """
+    Factor getShift used to apply recursively: every level moves the anchor
+    by scale * shift, so the shift grows by prod(1 + s) over the levels.
+    """
+    return np.prod(1.0 + np.array(fractLevels(scale)))
+
+
+def cameraPath(frames=FRAMES):
+    """
+    (frames, 4) array with the (xmin, xmax, ymin, ymax) view of every frame.
+
+    The square [-3, 3] view shrinks linearly while sliding towards the Zia
+    sun point at 45 degrees. The path cannot loop: the set is an outer sum
+    with cross-scale terms, so every level down holds copies relatively
+    SCALE_STEPDOWN times smaller than the one above and is not a rescaled
+    copy of it.
+    """
+    i = np.arange(frames)
+    POSX = np.cos(np.pi / 4)
+    dpf = 1.0 / frames
+    shift = i * dpf * POSX * shiftGain()
+    st = -3.0 * dpf * (frames - i) + shift
+    en = 3.0 * dpf * (frames - i) + shift
+    return np.column_stack((st, en, st, en))
+
 
-    st += shift
-    en += shift
+def animate(i, ax, path, scat=None, chunks=None):
+    print(f"Frame {i} of {FRAMES}")
+    st, en = path[i][:2]
+    ax.set_xlim(st, en)
+    ax.set_ylim(st, en)
+    if scat is not None:
+        # Regenerate only the points inside this frame, at its pixel size.
+        pixel = (en - st) / ax.get_window_extent().width
+        xpts, ypts = collectPoints(chunks((st, en, st, en), pixel))
+        scat.set_offsets(np.column_stack((xpts, ypts)))
+    return (ax,)
+
+
+def animateDensity(i, ax, path, im, raster, chunks):
+    print(f"Frame {i} of {FRAMES}")
+    st, en = path[i][:2]
+    raster.clear((st, en, st, en))
+    pixel = (en - st) / raster.width
+    raster.addChunks(chunks(raster.view, pixel))
+    im.set_data(raster.image(DENSITY_TONE))
+    im.set_extent((st, en, st, en))
     ax.set_xlim(st, en)
     ax.set_ylim(st, en)
     return (ax,)
 
 
+def densitySetup(width, height):
+    """Offline frame renderer, see offline.renderFrames."""
+    ziaObj = Zia(1.0, 2.0, 1, rayN=5, sunN=4)
+    ziapts = ziaObj.genZia()
+    raster = DensityRaster(width, height, (-3.0, 3.0, -3.0, 3.0))
+
+    def render(view):
+        raster.clear(view)
+        pixel = (view[1] - view[0]) / width
+        raster.addChunks(fractView(*ziapts, INIT_SCALE, view, pixel))
+        return raster.rgb(tone=DENSITY_TONE)
+
+    return render
+
+
 def main():
+    if OFFLINE:
+        views = cameraPath(FRAMES)
+        params = {"scale": INIT_SCALE, "stepdown": SCALE_STEPDOWN, "tone": DENSITY_TONE}
+        renderOffline(
+            densitySetup, OFFLINE_SIZE, views, FRAME_DIR, OUTPUTS, params=params
+        )
+        return
+
     ziaObj = Zia(1.0, 2.0, 1, rayN=5, sunN=4)
     xpts, ypts = ziaObj.genZia()
-    xpts, ypts = fract(xpts, ypts, INIT_SCALE)
+    ziapts = (xpts, ypts)
+    npts, nbytes = fractSize(len(xpts), INIT_SCALE)
+    chunks = None
+    if STORE_PATH:
+        store = fractStore(xpts, ypts, STORE_PATH)
+
+        def storeChunks(view, pixel):
+            # The density raster wants every point, the scatter a thinned out
+            # but still uniform subset.
+            step = 1 if DENSITY else max(1, store.count(view) // MAX_PLT_PTS)
+            return store.query(view, step=step)
+
+        chunks = storeChunks
+        xpts, ypts = np.array([]), np.array([])
+    elif LAZY_VIEW or DENSITY:
+
+        def viewChunks(view, pixel):
+            return fractView(*ziapts, INIT_SCALE, view, pixel)
+
+        chunks = viewChunks
+        xpts, ypts = np.array([]), np.array([])
+    elif nbytes > FRACT_MEM_BUDGET:
+        print(
+            "%d fractal points (%.1f MB) is over budget, sampling %d instead."
+            % (npts, nbytes / 2.0**20, MAX_PLT_PTS)
+        )
+        xpts, ypts = fractSample(xpts, ypts, INIT_SCALE, MAX_PLT_PTS)
+    else:
+        xpts, ypts = fract(xpts, ypts, INIT_SCALE)
     print("Finished calculating %d fractal points." % (len(xpts)))
 
+    path = cameraPath(FRAMES)
     fig, ax = plt.subplots()
     ax.set_aspect("equal")
     plt.axis("off")
@@ -72,10 +400,18 @@ def main():
     else:
         subinds = list(range(len(xpts)))
 
-    plt.scatter(xpts[subinds], ypts[subinds], s=1, color="black")
+    if DENSITY:
+        # Every point in the frame is binned, nothing is subsampled.
+        bbox = ax.get_window_extent()
+        raster = DensityRaster(bbox.width, bbox.height, (-3.0, 3.0, -3.0, 3.0))
+        im = ax.imshow(raster.image(), cmap="gray_r", vmin=0.0, vmax=1.0)
+        func, fargs = animateDensity, (ax, path, im, raster, chunks)
+    else:
+        scat = plt.scatter(xpts[subinds], ypts[subinds], s=1, color="black")
+        func, fargs = animate, (ax, path, scat, chunks) if chunks else (ax, path)
 
     ani = animation.FuncAnimation(
-        fig, animate, fargs=(ax,), frames=range(0, FRAMES), interval=30, blit=False
+        fig, func, fargs=fargs, frames=range(0, FRAMES), interval=30, blit=False
     )
     plt.show()
 
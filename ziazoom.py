@@ -3,18 +3,84 @@
 # @author: Theodore John McCormack
 
 from zia import Zia
+from offline import renderOffline
+import itertools
 import matplotlib.pyplot as plt
 import matplotlib.animation as animation
 import matplotlib.patches as patches
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 import numpy as np
 
+FRAMES = range(30, 150)
+FRAME_DIR = "frames/ziazoom"
+OUTPUTS = ("infzia.mp4", "infzia.gif")
+COLORS = ["red", "yellow", "turquoise"]
+# Every layer is 10^(-1/2) the size of the one before, and the view shrinks
+# by 10^(-1/40) per frame, so the scene repeats every 20 frames up to the
+# layer colors, and exactly every 20 * len(COLORS) frames.
+LAYER_RATIO = np.power(10.0, -0.5)
+FRAMES_PER_LAYER = 20
+LOOP_FRAMES = FRAMES_PER_LAYER * len(COLORS)
+# Only the layers from LAYERS_BEHIND steps larger than the view (whose inner
+# radius is then already outside of it) down to NUM_LAYERS - LAYERS_BEHIND
+# steps smaller are drawn.
+NUM_LAYERS = 4
+LAYERS_BEHIND = 1.5
 
-def animate(i, ax):
-    st = -3.0 * np.power(10.0, -i / 40.0)
-    en = -st
-    ax.set_xlim(st, en)
-    ax.set_ylim(st, en)
-    return (ax,)
+
+def frameDepth(i):
+    """Zoom depth of frame i, in layers."""
+    return i / float(FRAMES_PER_LAYER)
+
+
+class ZiaZoom(object):
+    """
+    Infinite zoom drawn with a fixed set of NUM_LAYERS scatter layers over
+    fixed [-3, 3] axes. Since the layers are exact scaled copies, zooming in
+    by one layer is the same as shifting every layer up one slot, so the
+    layers are recycled modulo one scale step and only the zoom depth
+    within the step and the layer index (for the color) matter. The work
+    per frame is constant and the depth can grow without bound.
+    """
+
+    def __init__(self, ax, npts=3000):
+        xpts, ypts = Zia(1, 2, 1, npts=npts).genZia()
+        self.base = np.column_stack((xpts, ypts))
+        self.scats = [ax.scatter(xpts, ypts, s=25) for _ in range(NUM_LAYERS)]
+        ax.set_xlim(-3.0, 3.0)
+        ax.set_ylim(-3.0, 3.0)
+
+    def update(self, depth):
+        # Layers are drawn large to small, so the smaller ones stay on top.
+        first = int(np.floor(depth - LAYERS_BEHIND)) + 1
+        for k, scat in enumerate(self.scats):
+            j = first + k
+            scat.set_offsets(self.base * np.power(LAYER_RATIO, j - depth))
+            scat.set_color(COLORS[j % len(COLORS)])
+        return self.scats
+
+
+def animate(i, zoom):
+    return zoom.update(frameDepth(i))
+
+
+def sceneSetup(fig_size, dpi):
+    """Offline frame renderer, see offline.renderFrames."""
+    fig = Figure(figsize=fig_size, dpi=dpi, facecolor="black")
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.subplots()
+    ax.set_aspect("equal")
+    ax.axis("off")
+    zoom = ZiaZoom(ax)
+    fig.tight_layout()
+
+    def render(depth):
+        zoom.update(depth)
+        canvas.draw()
+        return np.asarray(canvas.buffer_rgba())[..., :3].copy()
+
+    return render
 
 
 def main():
@@ -23,23 +89,30 @@ def main():
     fig.set_facecolor((0, 0, 0))
 
     plt.axis("off")
-    colors = ["red", "yellow", "turquoise"]
-    for j in range(12):
-        zia = Zia(1, 2, np.power(10.0, -j / 2.0), npts=3000)
-        xpts, ypts = zia.genZia()
-        plt.scatter(xpts, ypts, s=25, color=colors[j % len(colors)])
+    zoom = ZiaZoom(ax)
 
+    # The zoom never runs out, so keep going until the window is closed.
     ani = animation.FuncAnimation(
-        fig, animate, fargs=(ax,), frames=range(30, 150), interval=30, blit=True
+        fig,
+        animate,
+        fargs=(zoom,),
+        frames=itertools.count(FRAMES.start),
+        interval=30,
+        blit=True,
+        cache_frame_data=False,
     )
     plt.tight_layout()
     plt.show()
 
-    Writer = animation.writers["ffmpeg"]
-    writer = Writer(fps=30, metadata=dict(artist="Matplotlib"), bitrate=1800)
-    savefig_kwargs = {"facecolor": "black"}
-    ani.save("infzia.mp4", writer=writer, savefig_kwargs=savefig_kwargs)
-    ani.save("infzia.gif", writer="imagemagick", savefig_kwargs=savefig_kwargs)
+    # Render the frames once, in parallel, and encode them into every output
+    # instead of replaying the animation once per writer. FRAMES spans whole
+    # LOOP_FRAMES periods, so the outputs loop seamlessly.
+    depths = [frameDepth(i) for i in FRAMES]
+    setupArgs = (tuple(fig.get_size_inches()), fig.dpi)
+    params = {"colors": COLORS, "ratio": LAYER_RATIO, "layers": NUM_LAYERS}
+    renderOffline(
+        sceneSetup, setupArgs, depths, FRAME_DIR, OUTPUTS, fps=30, params=params
+    )
 
 
 if __name__ == "__main__":